@@ -49,16 +49,49 @@ class Config:
     max_caption_length: int = 1024
     max_text_length: int = 4096
     cmd_prefix: str = get_env("CMD_PREFIX", "/")
+    admin_cache_ttl: float = float(get_env("ADMIN_CACHE_TTL", 600))
+    admin_cache_size: int = int(get_env("ADMIN_CACHE_SIZE", 1024))
+    admin_warm_chats: List[int] = field(default_factory=list)
+    admin_warm_rate: float = float(get_env("ADMIN_WARM_RATE", 1))
+    flood_global_rate: float = float(get_env("FLOOD_GLOBAL_RATE", 30))
+    flood_chat_rate: float = float(get_env("FLOOD_CHAT_RATE", 1))
+    flood_group_rate: float = float(get_env("FLOOD_GROUP_RATE", 20 / 60))
+    flood_burst: float = float(get_env("FLOOD_BURST", 3))
+    edit_interval: float = float(get_env("EDIT_INTERVAL", 1))
+    http_cache_size: int = int(get_env("HTTP_CACHE_SIZE", 256))
+    http_pool_limit: int = int(get_env("HTTP_POOL_LIMIT", 100))
+    http_pool_limit_per_host: int = int(get_env("HTTP_POOL_LIMIT_PER_HOST", 20))
+    http_keepalive: float = float(get_env("HTTP_KEEPALIVE", 30))
+    http_dns_ttl: int = int(get_env("HTTP_DNS_TTL", 300))
+    ingress_max_pending: int = int(get_env("INGRESS_MAX_PENDING", 1000))
+    ingress_lane_limit: int = int(get_env("INGRESS_LANE_LIMIT", 50))
+    ingress_max_age: float = float(get_env("INGRESS_MAX_AGE", 30))
+    ingress_inline_max_age: float = float(get_env("INGRESS_INLINE_MAX_AGE", 5))
+    io_pool_size: int = int(get_env("IO_POOL_SIZE", 0))
+    cpu_pool_size: int = int(get_env("CPU_POOL_SIZE", 0))
+    lazy_modules: bool = str(get_env("LAZY_MODULES", "true")).lower() == "true"
+    module_warmup: float = float(get_env("MODULE_WARMUP", 10))
+    bulk_workers: int = int(get_env("BULK_WORKERS", 4))
+    bulk_queue_size: int = int(get_env("BULK_QUEUE_SIZE", 64))
+    metrics_host: str = get_env("METRICS_HOST", "127.0.0.1")
+    metrics_port: int = int(get_env("METRICS_PORT", 0))
+    shutdown_timeout: float = float(get_env("SHUTDOWN_TIMEOUT", 10))
+    # Deadline of /evil -thread / -proc snippets, 0 = none
+    eval_timeout: float = float(get_env("EVAL_TIMEOUT", 60))
+    # /term jobs: CPU seconds and MB of memory per process, MB of output, 0 = none
+    term_cpu_limit: int = int(get_env("TERM_CPU_LIMIT", 0))
+    term_memory_limit: int = int(get_env("TERM_MEMORY_LIMIT", 0))
+    term_output_limit: int = int(get_env("TERM_OUTPUT_LIMIT", 0))
 
     def __post_init__(self):
         self.down_path.mkdir(exist_ok=True, parents=True)
         Path(self.workdir).mkdir(exist_ok=True, parents=True)
-        for attr in ("owner_id", "sudo_users"):
+        for attr in ("owner_id", "sudo_users", "admin_warm_chats"):
             getattr(self, attr).extend(
                 filter(
                     None,
                     map(
-                        lambda x: int(x) if x.isdigit() else None,
+                        lambda x: int(x) if x.lstrip("-").isdigit() else None,
                         get_env(attr.upper(), "").split(),
                     ),
                 )
@@ -0,0 +1,243 @@
+__all__ = ["AdminCache", "ADMIN_CACHE"]
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from pyrogram import Client
+from pyrogram.types import ChatMemberUpdated
+
+from ..config import CONFIG
+
+LOG = logging.getLogger(__name__)
+
+Fetcher = Callable[[], Awaitable[FrozenSet[int]]]
+# Fetches of a chat whose members keep changing meanwhile, before giving up on caching
+_FETCH_TRIES = 3
+
+
+class AdminCache:
+    """Bounded per-chat admin cache
+
+    ~ TTL expiry, LRU eviction and single-flight fetches
+    """
+
+    def __init__(
+        self, ttl: float = 600.0, max_size: int = 1024, idle_ttl: Optional[float] = None
+    ) -> None:
+        """
+        Parameters:
+        ----------
+            - ttl (`float`, optional): Seconds before a cached admin list expires. (Defaults to `600.0`)
+            - max_size (`int`, optional): Max. number of chats to keep cached. (Defaults to `1024`)
+            - idle_ttl (`Optional[float]`, optional): Chats without admin checks for this long
+                aren't pre-warmed anymore. (Defaults to `4 * ttl`)
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.idle_ttl = 4 * ttl if idle_ttl is None else idle_ttl
+        self._data: "OrderedDict[int, Tuple[float, FrozenSet[int]]]" = OrderedDict()
+        self._pending: Dict[int, asyncio.Task] = {}
+        # Chat -> member updates seen while its fetch is in flight
+        self._versions: Dict[int, int] = {}
+        # Chats that asked for admin checks -> last check, kept beyond expiry for pre-warming
+        self._seen: "OrderedDict[int, float]" = OrderedDict()
+        # Warmed even when idle (configured chats)
+        self._pinned: Set[int] = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return self.peek(chat_id) is not None
+
+    def peek(self, chat_id: int) -> Optional[FrozenSet[int]]:
+        """Cached admin ids of a chat (if still fresh) without touching counters"""
+        if (entry := self._data.get(chat_id)) is None:
+            return
+        expires, admins = entry
+        if expires < time.monotonic():
+            del self._data[chat_id]
+            return
+        return admins
+
+    def set(self, chat_id: int, admins: FrozenSet[int]) -> None:
+        self._data[chat_id] = (time.monotonic() + self.ttl, frozenset(admins))
+        self._data.move_to_end(chat_id)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def touch(self, chat_id: int) -> None:
+        """Remember a chat as active so the warmer keeps it fresh"""
+        self._seen[chat_id] = time.monotonic()
+        self._seen.move_to_end(chat_id)
+        while len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+
+    def patch(self, chat_id: int, user_id: int, is_admin: bool) -> None:
+        """Add or remove a single admin of a cached chat in place"""
+        if chat_id in self._versions:
+            # The fetch in flight may predate this change
+            self._versions[chat_id] += 1
+        if (entry := self._data.get(chat_id)) is None:
+            return
+        expires, admins = entry
+        if is_admin:
+            admins = admins | {user_id}
+        else:
+            admins = admins - {user_id}
+        self._data[chat_id] = (expires, admins)
+
+    async def get(self, chat_id: int, fetch: Fetcher) -> FrozenSet[int]:
+        """Get admin ids of a chat, fetching them once if missing or expired.
+
+        Concurrent callers for the same chat share a single ``fetch()``.
+
+        Parameters:
+        ----------
+            - chat_id (`int`): Chat ID.
+            - fetch (`Fetcher`): Coroutine function returning the admin user ids.
+
+        Returns:
+        -------
+            `FrozenSet[int]`: User IDs of chat admins
+        """
+        self.touch(chat_id)
+        if (admins := self.peek(chat_id)) is not None:
+            self.hits += 1
+            self._data.move_to_end(chat_id)
+            return admins
+        self.misses += 1
+        return await self._load(chat_id, fetch)
+
+    async def _load(self, chat_id: int, fetch: Fetcher) -> FrozenSet[int]:
+        if (task := self._pending.get(chat_id)) is None:
+            # A task of its own, so a cancelled caller doesn't cancel the others
+            task = self._pending[chat_id] = asyncio.ensure_future(
+                self._fetch(chat_id, fetch)
+            )
+            # Avoid "exception was never retrieved" if every caller went away
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    async def _fetch(self, chat_id: int, fetch: Fetcher) -> FrozenSet[int]:
+        self._versions[chat_id] = 0
+        try:
+            for _ in range(_FETCH_TRIES):
+                version = self._versions[chat_id]
+                admins = frozenset(await fetch())
+                if self._versions[chat_id] == version:
+                    self.set(chat_id, admins)
+                    return admins
+            # Still changing, not cached so the next check fetches again
+            return admins
+        finally:
+            self._pending.pop(chat_id, None)
+            self._versions.pop(chat_id, None)
+
+    def pop(self, chat_id: int) -> None:
+        self._data.pop(chat_id, None)
+
+    def forget(self, chat_id: int) -> None:
+        self.pop(chat_id)
+        self._seen.pop(chat_id, None)
+        self._pinned.discard(chat_id)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stale(self, margin: float = 0.0) -> Iterable[int]:
+        """Active chats which are missing or expire within ``margin`` seconds
+
+        Chats idle for longer than ``idle_ttl`` are dropped instead.
+        """
+        now = time.monotonic()
+        deadline = now + margin
+        for chat_id, last_seen in tuple(self._seen.items()):
+            if now - last_seen > self.idle_ttl and chat_id not in self._pinned:
+                del self._seen[chat_id]
+                continue
+            entry = self._data.get(chat_id)
+            if (entry is None or entry[0] < deadline) and chat_id not in self._pending:
+                yield chat_id
+
+    async def refresh(self, client: Client, chat_id: int) -> FrozenSet[int]:
+        """Fetch admins of a chat with the given client and update the cache"""
+
+        async def fetch() -> FrozenSet[int]:
+            admins = await client.get_chat_members(chat_id, filter="administrators")
+            return frozenset(admin.user.id for admin in admins)
+
+        return await self._load(chat_id, fetch)
+
+    async def warm(
+        self,
+        client: Client,
+        chat_ids: Iterable[int] = (),
+        rate: float = 1.0,
+    ) -> None:
+        """Keep admin lists of active chats fresh in the background
+
+        Parameters:
+        ----------
+            - client (`Client`): Pyrogram Client used for fetching.
+            - chat_ids (`Iterable[int]`, optional): Chats to warm up on start. (Defaults to `()`)
+            - rate (`float`, optional): Max. fetches per second. (Defaults to `1.0`)
+        """
+        for chat_id in chat_ids:
+            self.touch(chat_id)
+            self._pinned.add(chat_id)
+        delay = 1 / rate if rate > 0 else 0
+        while True:
+            for chat_id in self.stale(margin=self.ttl / 4):
+                try:
+                    await self.refresh(client, chat_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    LOG.warning(f"Failed to warm admins of {chat_id} - {e}")
+                    self.forget(chat_id)
+                await asyncio.sleep(delay)
+            await asyncio.sleep(max(self.ttl / 8, 1))
+
+    async def on_member_updated(
+        self, client: Client, update: ChatMemberUpdated
+    ) -> None:
+        """Patch cached admins from a chat member change"""
+        if not (member := update.new_chat_member):
+            return
+        chat_id = update.chat.id
+        if member.user.is_self and member.status in ("left", "kicked"):
+            self.forget(chat_id)
+            return
+        self.patch(
+            chat_id, member.user.id, member.status in ("creator", "administrator")
+        )
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            size=len(self._data),
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            inflight=len(self._pending),
+        )
+
+
+ADMIN_CACHE = AdminCache(ttl=CONFIG.admin_cache_ttl, max_size=CONFIG.admin_cache_size)
@@ -1,52 +1,129 @@
 import logging
-from functools import wraps
-from typing import Dict, List
+import time
+from functools import partial, wraps
+from typing import Any, Callable, Dict, FrozenSet
 
 from pyrogram import Client, ContinuePropagation, StopPropagation
-from pyrogram.types import ChatMember, Message, Update
+from pyrogram.types import Message, Update
 
 from ..mod import Module
-from .command_context import Ctx
+from .admin_cache import ADMIN_CACHE
+from .command_context import Ctx, FlagError
+from .inflight import INFLIGHT
+from .metrics import HANDLER_ERRORS, HANDLER_LATENCY, HANDLERS_INFLIGHT
+from .perf import PERF
+from .scheduler import PRIORITIES, SCHEDULER, dedup_key, lane_key
 
-_CHAT_ADMINS: Dict[int, List[ChatMember]] = {}
 LOG = logging.getLogger(__name__)
 
 
 class BaseDecorator:
-    """Base decorator class"""
+    """Base decorator class
+
+    Handlers run on the `SCHEDULER` after pyrogram's dispatch has moved on, so
+    raising `StopPropagation` inside one has no effect. ``propagate=False``
+    stops later handler groups as soon as the handler's filters match.
+    ``shed_reply`` is sent back to a message whose handler was shed under load.
+    """
 
     def __init__(self, *args, **kwargs):
 
         self.args = args
         self.kwargs = kwargs
+        if (priority := kwargs.get("priority")) and priority not in PRIORITIES:
+            raise ValueError(
+                f"[!] Invalid priority: {priority}, expected one of {PRIORITIES}"
+            )
 
     def _add_attributes(self, _func):
         if not hasattr(_func, "_handle"):
-            for attr in ("handle", "filters", "group"):
+            for attr in ("handle", "filters", "group", "command"):
                 setattr(_func, f"_{attr}", self.kwargs.get(attr))
 
     def __call__(self, func):
         @wraps(func)
         async def wrapper(mod: Module, client: Client, update: Update):
-            if not await self.check(client, update):
+            if not INFLIGHT.accepting:
+                # Shutting down
+                INFLIGHT.rejected += 1
                 return
-
-            context = Ctx(update) if isinstance(update, Message) else update
-
-            try:
-                out = await func(mod, context)
-            except StopPropagation:
-                raise
-            except ContinuePropagation:
-                pass
-            except Exception as e:
-                mod.log.error(e, exc_info=True)
-            else:
-                return out
+            # Set by filters on the shared update, a later handler group may change them
+            state = {
+                k: getattr(update, k, None)
+                for k in ("command", "matches", "args_offset")
+            }
+            if (dedup := dedup_key(update)) is not None:
+                # Per handler, the same update may match more than one
+                dedup = (*dedup, func.__qualname__)
+            queued = await SCHEDULER.submit(
+                lane_key(update),
+                self.kwargs.get("priority") or "interactive",
+                partial(self._run_handler, func, mod, client, update, state),
+                dedup=dedup,
+            )
+            if (
+                not queued
+                and (text := self.kwargs.get("shed_reply"))
+                and isinstance(update, Message)
+            ):
+                SCHEDULER.detach(update.reply(text, quote=True))
+            if self.kwargs.get("propagate") is False:
+                # Decided at dispatch, the handler itself runs later
+                raise StopPropagation
 
         self._add_attributes(wrapper)
         return wrapper
 
+    async def _run_handler(
+        self,
+        func: Callable,
+        mod: Module,
+        client: Client,
+        update: Update,
+        state: Dict[str, Any],
+    ) -> Any:
+        if not INFLIGHT.accepting:
+            INFLIGHT.rejected += 1
+            return
+        for attr, value in state.items():
+            if value is not None:
+                setattr(update, attr, value)
+        if not await self.check(client, update):
+            return
+
+        if isinstance(update, Message):
+            context = Ctx(update, self.kwargs.get("flags"))
+            if context.schema:
+                try:
+                    context.args
+                except FlagError as e:
+                    await context.err(str(e), del_in=5)
+                    return
+        else:
+            context = update
+
+        labels = (mod.__class__.__name__, func.__name__)
+        failed = False
+        HANDLERS_INFLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            out = await INFLIGHT.run(func(mod, context))
+        except StopPropagation:
+            raise
+        except ContinuePropagation:
+            pass
+        except Exception as e:
+            failed = True
+            HANDLER_ERRORS.inc(*labels)
+            mod.log.error(e, exc_info=True)
+        else:
+            return out
+        finally:
+            elapsed = time.perf_counter() - start
+            HANDLERS_INFLIGHT.dec()
+            HANDLER_LATENCY.observe(*labels, value=elapsed)
+            PERF.observe(*labels, elapsed, failed)
+
     async def check(self, c: Client, u: Update):
         if isinstance(u, Message):
             if self.kwargs.get("admin_only"):
@@ -54,26 +131,23 @@ class BaseDecorator:
         return True
 
     async def check_admin(self, m: Message) -> bool:
-        global _CHAT_ADMINS
-        chat_id = m.chat.id
-        user_id = m.from_user.id
-        if not (admins := _CHAT_ADMINS.get(chat_id)):
-            try:
-                admins = await m.chat.get_members(filter="administrators")
-            except Exception as e:
-                LOG.exception(f"{e}: {e.__class__.__name__}")
-                return False
-            _CHAT_ADMINS[chat_id] = admins
-
-        for admin in admins:
-            if user_id == admin.user.id:
-                return True
-        return False
+        if not m.from_user:
+            return False
+
+        async def fetch() -> FrozenSet[int]:
+            admins = await m.chat.get_members(filter="administrators")
+            return frozenset(admin.user.id for admin in admins)
+
+        try:
+            admins = await ADMIN_CACHE.get(m.chat.id, fetch)
+        except Exception as e:
+            LOG.exception(f"{e}: {e.__class__.__name__}")
+            return False
+        return m.from_user.id in admins
 
 
 def refresh_admin_cache(chat_id: int = 0, clear_all: bool = False) -> None:
-    global _CHAT_ADMINS
     if clear_all:
-        _CHAT_ADMINS.clear()
+        ADMIN_CACHE.clear()
     else:
-        _CHAT_ADMINS.pop(chat_id, None)
+        ADMIN_CACHE.pop(chat_id)
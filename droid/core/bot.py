@@ -4,9 +4,14 @@ import time
 from datetime import datetime
 from typing import Optional, Union
 
+from ..config import CONFIG
+from ..utils import shutdown_pools
 from .http import Http
+from .inflight import INFLIGHT
 from .loader import Loader
+from .metrics import METRICS
 from .pyrogram_bot import PyroBot
+from .scheduler import SCHEDULER
 
 
 class Bot(Http, PyroBot, Loader):
@@ -30,8 +35,20 @@ class Bot(Http, PyroBot, Loader):
     async def stop(self):
         self.log.info("Stopping bot...")
         self.stopped = True
+        finished, cancelled = await INFLIGHT.drain(CONFIG.shutdown_timeout)
+        if finished or cancelled:
+            self.log.info(
+                f"Drained handlers: {finished} finished, {cancelled} cancelled"
+                f" ({INFLIGHT.rejected} updates rejected)."
+            )
+        await SCHEDULER.stop()
+        for task in (self._admin_warmer, self._module_warmer):
+            if task and not task.done():
+                task.cancel()
         self.log.info("Executing on_exit tasks...")
         await self.on_exit_tasks()
+        await METRICS.stop_server()
+        shutdown_pools()
         self.log.info("Closing http session...")
         await self.close_session()
         if self.client.is_initialized:
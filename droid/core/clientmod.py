@@ -1,26 +1,63 @@
 import asyncio
+from functools import partial
 from logging import getLogger
 
 from pyrogram import Client
 from pyrogram.errors import FloodWait, SlowmodeWait
 
+from ..config import CONFIG
+from .edit_queue import EditCoalescer
+from .metrics import FLOOD_SLEEP, FLOOD_WAITS, RPC_TOTAL
+from .rate_limiter import RateLimiter
+
 log = getLogger(__name__)
 
 
 class Droid(Client):
     def __init__(self, *args, **kwargs):
         self.__max_tries: int = 5
+        self.limiter = RateLimiter(
+            global_rate=CONFIG.flood_global_rate,
+            chat_rate=CONFIG.flood_chat_rate,
+            group_rate=CONFIG.flood_group_rate,
+            burst=CONFIG.flood_burst,
+        )
+        self.edits = EditCoalescer(interval=CONFIG.edit_interval)
         super().__init__(*args, **kwargs)
 
-    async def send(self, *args, **kwargs):
+    async def edit_message_text(self, chat_id, message_id, text, *args, **kwargs):
+        """Coalesced `Client.edit_message_text`, see `EditCoalescer`"""
+        return await self.edits.submit(
+            (chat_id, message_id),
+            partial(
+                super().edit_message_text, chat_id, message_id, text, *args, **kwargs
+            ),
+            signature=(text, repr(args), repr(kwargs)),
+        )
+
+    async def edit_inline_text(self, inline_message_id, text, *args, **kwargs):
+        """Coalesced `Client.edit_inline_text`, see `EditCoalescer`"""
+        return await self.edits.submit(
+            inline_message_id,
+            partial(super().edit_inline_text, inline_message_id, text, *args, **kwargs),
+            signature=(text, repr(args), repr(kwargs)),
+        )
+
+    async def send(self, data, *args, **kwargs):
         try_count = 0
 
+        method = getattr(data, "QUALNAME", data.__class__.__name__)
         while True:
+            key = await self.limiter.acquire(data)
+            RPC_TOTAL.inc(method)
             try:
-                return await super().send(*args, **kwargs)
+                return await super().send(data, *args, **kwargs)
             except (FloodWait, SlowmodeWait) as e:
+                FLOOD_WAITS.inc(method)
+                self.limiter.flood(key, e.x)
                 if try_count > self.__max_tries:
                     raise e
                 log.info(f"{e.__class__.__name__}: sleeping for - {e.x}s.")
+                FLOOD_SLEEP.inc(amount=e.x + 2)
                 await asyncio.sleep(e.x + 2)
                 try_count += 1
@@ -1,22 +1,251 @@
-import asyncio
 import re
-import tempfile
-from typing import Dict, List, Optional, Tuple, Union
+import string
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
 from pyrogram.errors import MessageAuthorRequired
-from pyrogram.types import Message
+from pyrogram.parser.utils import add_surrogates, remove_surrogates
+from pyrogram.types import Message, MessageEntity
 
 from ..config import CONFIG
+from .scheduler import delete_in
 
 FLAGS_RE = re.compile(
     # Valid flags: https://regex101.com/r/nQ0H9S/1
     r"(?:^|\s)-{1,2}(?P<flag>[A-Za-z_]+)[=]?(?P<value>\w+|\"[\w\s'-]+\"|\'[\w\s\"-]+\')?(?:(?=$)|(?=\s))"
 )
+# Flag names, `[A-Za-z_]` of `FLAGS_RE`
+_FLAG_CHARS = frozenset(string.ascii_letters + "_")
+# Quote -> other chars allowed in a quoted value besides `\w` and `\s`
+_QUOTES = {'"': "'-", "'": '"-'}
+_FALSY = ("0", "false", "no", "off", "n")
+
+FlagSchema = Dict[str, Union[Type, Tuple[Type, Any]]]
+
+
+class FlagError(ValueError):
+    pass
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class _FlagScanner:
+    """Matches `FLAGS_RE` at given positions, every char is looked at O(1) times
+
+    Letter, word and quoted runs are delimited by whitespace or their quote, so
+    the runs tried from different positions don't overlap.
+    """
+
+    __slots__ = ("text", "n")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.n = len(text)
+
+    def _boundary(self, i: int) -> bool:
+        return i == self.n or self.text[i].isspace()
+
+    def _value_end(self, i: int) -> Optional[int]:
+        """End of a value starting at ``i`` followed by a boundary"""
+        text, n = self.text, self.n
+        if i >= n:
+            return None
+        if _is_word(text[i]):
+            end = i + 1
+            while end < n and _is_word(text[end]):
+                end += 1
+            return end if self._boundary(end) else None
+        if (extra := _QUOTES.get(quote := text[i])) is not None:
+            end = i + 1
+            while end < n and (
+                _is_word(char := text[end]) or char.isspace() or char in extra
+            ):
+                end += 1
+            if end > i + 1 and end < n and text[end] == quote:
+                if self._boundary(end + 1):
+                    return end + 1
+        return None
+
+    def match(self, i: int) -> Optional[Tuple[str, str, int]]:
+        """(flag, value, end) of a flag starting with the dash at ``i``"""
+        text, n = self.text, self.n
+        start = i + 2 if text.startswith("--", i) else i + 1
+        if start >= n or text[start] not in _FLAG_CHARS:
+            if start == i + 2 and text[i + 1] in _FLAG_CHARS:
+                start = i + 1
+            else:
+                return None
+        end = start + 1
+        while end < n and text[end] in _FLAG_CHARS:
+            end += 1
+        flag = text[start:end]
+        if end < n and text[end] == "=":
+            if (value_end := self._value_end(end + 1)) is not None:
+                return flag, text[end + 1 : value_end], value_end
+            if self._boundary(end + 1):
+                return flag, "", end + 1
+        if (value_end := self._value_end(end)) is not None:
+            return flag, text[end:value_end], value_end
+        if self._boundary(end):
+            return flag, "", end
+        return None
+
+
+def parse_flags(text: str) -> Tuple[List[Tuple[str, str]], str]:
+    """Split flags out of a text in one linear pass
+
+    Parameters:
+    ----------
+        - text (`str`): Message text.
+
+    Returns:
+    -------
+        `Tuple[List[Tuple[str, str]], str]`: ([("flag", "value")], text without flags)
+    """
+    flags: List[Tuple[str, str]] = []
+    kept: List[str] = []
+    scanner = _FlagScanner(text)
+    last = pos = 0
+    while (pos := text.find("-", pos)) != -1:
+        if (pos == 0 or text[pos - 1].isspace()) and (
+            found := scanner.match(pos)
+        ) is not None:
+            flag, value, end = found
+            flags.append((flag, value))
+            # Like `FLAGS_RE.sub`, drop the whitespace before the flag as well
+            kept.append(text[last : max(pos - 1, 0)])
+            last = pos = end
+        else:
+            pos += 1
+    kept.append(text[last:])
+    return flags, "".join(kept)
+
+
+def apply_schema(flags: Dict[str, str], schema: FlagSchema) -> Dict[str, Any]:
+    """Convert raw flags to typed arguments
+
+    Parameters:
+    ----------
+        - flags (`Dict[str, str]`): Raw flags.
+        - schema (`FlagSchema`): {"flag": type} or {"flag": (type, default)}, type is one of `int`, `float`, `bool`, `str`.
+
+    Raises:
+    ------
+        `FlagError`: If a flag value can't be converted.
+
+    Returns:
+    -------
+        `Dict[str, Any]`: {"flag": value}
+    """
+    args: Dict[str, Any] = {}
+    for name, spec in schema.items():
+        kind, default = spec if isinstance(spec, tuple) else (spec, None)
+        if kind is bool and default is None:
+            default = False
+        if name not in flags:
+            args[name] = default
+            continue
+        value = flags[name]
+        if len(value) > 1 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        if kind is bool:
+            args[name] = value.lower() not in _FALSY
+        elif kind is str:
+            args[name] = value
+        else:
+            try:
+                args[name] = kind(value)
+            except ValueError:
+                raise FlagError(
+                    f"Flag '-{name}' expects {kind.__name__}, got {value!r}"
+                ) from None
+    return args
+
+
+def _cut_point(text: str, start: int, limit: int, entities: List[MessageEntity]) -> int:
+    end = start + limit
+
+    def inside(i: int) -> bool:
+        return any(e.offset < i < e.offset + e.length for e in entities)
+
+    # Prefer line breaks outside entities, then any line break, then spaces
+    for sep, check in (("\n", True), ("\n", False), (" ", True), (" ", False)):
+        i = end
+        while (i := text.rfind(sep, start + limit // 4, i)) != -1:
+            if not (check and inside(i + 1)):
+                return i + 1
+    # Don't split a surrogate pair
+    return end - 1 if "\ud800" <= text[end - 1] <= "\udbff" else end
+
+
+def split_entities(
+    text: str, entities: List[MessageEntity], limit: int
+) -> List[Tuple[str, List[MessageEntity]]]:
+    """Split text (with surrogates) in parts of max. ``limit`` UTF-16 units.
+
+    Cuts are made at line breaks and outside entities whenever possible,
+    entities crossing a cut are split between both parts.
+
+    Parameters:
+    ----------
+        - text (`str`): Text with surrogate pairs (see `add_surrogates`).
+        - entities (`List[MessageEntity]`): Entities of the text.
+        - limit (`int`): Max. length of a part.
+
+    Returns:
+    -------
+        `List[Tuple[str, List[MessageEntity]]]`: [(text, entities)]
+    """
+    parts = []
+    start = 0
+    while start < len(text):
+        end = (
+            len(text)
+            if len(text) - start <= limit
+            else _cut_point(text, start, limit, entities)
+        )
+        chunk = text[start:end]
+        # Telegram strips surrounding whitespace, shift entities accordingly
+        lead = len(chunk) - len(chunk.lstrip())
+        chunk = chunk.strip()
+        a, b = start + lead, start + lead + len(chunk)
+        if chunk:
+            parts.append(
+                (
+                    chunk,
+                    [
+                        MessageEntity(
+                            type=e.type,
+                            offset=max(e.offset, a) - a,
+                            length=min(e.offset + e.length, b) - max(e.offset, a),
+                            url=e.url,
+                            user=e.user,
+                            language=e.language,
+                        )
+                        for e in entities
+                        if e.offset < b and e.offset + e.length > a
+                    ],
+                )
+            )
+        start = end
+    return parts
 
 
 class Ctx:
-    def __init__(self, message: Message) -> None:
+    __slots__ = ("msg", "schema", "_parsed", "_args")
+
+    def __init__(self, message: Message, schema: Optional[FlagSchema] = None) -> None:
         self.msg = message
+        self.schema = schema
+        self._parsed: Optional[Tuple[List[Tuple[str, str]], str]] = None
+        self._args: Optional[Dict[str, Any]] = None
+
+    def _parse(self) -> Tuple[List[Tuple[str, str]], str]:
+        if self._parsed is None:
+            self._parsed = parse_flags(self.msg.text) if self.msg.text else ([], "")
+        return self._parsed
 
     @property
     def flags(self) -> Optional[Dict[str, str]]:
@@ -27,7 +256,7 @@ class Ctx:
             `Optional[Dict[str, str]]`: {"flag": "value"}
         """
         if self.msg.text:
-            return dict(self.flags_raw)
+            return dict(self._parse()[0])
 
     @property
     def flags_raw(self) -> Optional[List[Tuple[str, str]]]:
@@ -38,7 +267,23 @@ class Ctx:
             `Optional[List[Tuple[str, str]]]`: [("flag", "value")]
         """
         if self.msg.text:
-            return FLAGS_RE.findall(self.msg.text)
+            return list(self._parse()[0])
+
+    @property
+    def args(self) -> Dict[str, Any]:
+        """Flags converted as per the handler's flag schema
+
+        Raises:
+        ------
+            `FlagError`: If a flag value doesn't match the schema.
+
+        Returns:
+        -------
+            `Dict[str, Any]`: {"flag": value}
+        """
+        if self._args is None:
+            self._args = apply_schema(self.flags or {}, self.schema or {})
+        return self._args
 
     @property
     def input(self) -> str:
@@ -48,7 +293,7 @@ class Ctx:
         -------
             `str`
         """
-        return self.filtered[len(f"{CONFIG.cmd_prefix}{self.msg.command[0]} ") :]
+        return self.filtered[self._args_offset :]
 
     @property
     def input_raw(self) -> str:
@@ -59,7 +304,14 @@ class Ctx:
             `str`
         """
         if self.msg.text:
-            return self.msg.text[len(f"{CONFIG.cmd_prefix}{self.msg.command[0]} ") :]
+            return self.msg.text[self._args_offset :]
+
+    @property
+    def _args_offset(self) -> int:
+        # Set by `CommandRouter`, the plain prefix + command otherwise
+        if (offset := getattr(self.msg, "args_offset", None)) is not None:
+            return offset
+        return len(f"{CONFIG.cmd_prefix}{self.msg.command[0]} ")
 
     @property
     def filtered(self) -> str:
@@ -69,47 +321,88 @@ class Ctx:
         -------
             `str`
         """
-        return FLAGS_RE.sub("", self.msg.text) if self.msg.text else ""
+        return self._parse()[1]
 
-    async def edit(
-        self, text: str, *args, del_in: float = 0.0, **kwargs
-    ) -> Union[bool, Message]:
+    async def edit(self, text: str, *args, del_in: float = 0.0, **kwargs) -> Message:
+        """Edit the message (reply if not the author), ``del_in`` deletes it later in the background"""
         try:
             edited = await self.msg.edit_text(text, *args, **kwargs)
         except MessageAuthorRequired:
             edited = await self.reply(text, *args, **kwargs)
         if isinstance(del_in, (int, float)) and del_in > 0:
-            await asyncio.sleep(del_in)
-            return bool(await edited.delete())
+            delete_in(del_in, edited)
         return edited
 
-    async def err(self, text: str, *args, **kwargs) -> Union[bool, Message]:
+    async def err(self, text: str, *args, **kwargs) -> Message:
         return await self.edit(f"**ERROR**: `{text}`", *args, **kwargs)
 
     async def reply(
-        self, text: str, *args, quote: bool = True, del_in: float = 0.0, **kwargs
-    ) -> Union[bool, Message]:
-        if len(text) >= CONFIG.max_text_length:
-            with tempfile.NamedTemporaryFile(
-                mode="w", delete=True, suffix=".txt"
-            ) as temp:
-                temp.write(text)
-                temp.seek(0)  # return to start of the file
-                replied = await self.msg._client.send_document(
-                    chat_id=self.msg.chat.id,
-                    document=temp.name,
-                    thumb=None,
-                    caption="<code>Output</code>",
-                    parse_mode="HTML",
-                    force_document=True,
-                    disable_notification=False,
-                    reply_to_message_id=self.msg.message_id if quote else None,
-                    reply_markup=None,
-                )
+        self,
+        text: str,
+        *args,
+        quote: bool = True,
+        del_in: float = 0.0,
+        split: bool = False,
+        **kwargs,
+    ) -> Message:
+        """Reply to the message, long texts are sent as a file or split (``split=True``)
 
+        ``del_in`` deletes the reply later in the background.
+        """
+        if len(text) < CONFIG.max_text_length:
+            replied = [await self.msg.reply_text(text, *args, quote=quote, **kwargs)]
+        elif split:
+            replied = await self._reply_split(text, quote=quote, **kwargs)
         else:
-            replied = await self.msg.reply_text(text, *args, quote=quote, **kwargs)
+            with BytesIO(text.encode("utf-8")) as doc:
+                doc.name = "output.txt"
+                replied = [
+                    await self.msg._client.send_document(
+                        chat_id=self.msg.chat.id,
+                        document=doc,
+                        thumb=None,
+                        caption="<code>Output</code>",
+                        parse_mode="HTML",
+                        force_document=True,
+                        disable_notification=False,
+                        reply_to_message_id=self.msg.message_id if quote else None,
+                        reply_markup=None,
+                    )
+                ]
         if isinstance(del_in, (int, float)) and del_in > 0:
-            await asyncio.sleep(del_in)
-            return bool(await replied.delete())
-        return replied
+            delete_in(del_in, *replied)
+        return replied[-1]
+
+    async def _reply_split(
+        self,
+        text: str,
+        quote: bool = True,
+        parse_mode: Optional[str] = object,
+        **kwargs,
+    ) -> List[Message]:
+        client = self.msg._client
+        parsed = await client.parser.parse(text, parse_mode)
+        entities = list(
+            filter(
+                None, (MessageEntity._parse(client, e, {}) for e in parsed["entities"])
+            )
+        )
+        kwargs.pop("entities", None)
+        reply_to = (
+            self.msg.message_id if quote else kwargs.pop("reply_to_message_id", None)
+        )
+        sent: List[Message] = []
+        # Paced by the client's per-chat rate limiter
+        for chunk, chunk_entities in split_entities(
+            add_surrogates(parsed["message"]), entities, CONFIG.max_text_length
+        ):
+            sent.append(
+                await client.send_message(
+                    chat_id=self.msg.chat.id,
+                    text=remove_surrogates(chunk),
+                    entities=chunk_entities,
+                    reply_to_message_id=None if sent else reply_to,
+                    **kwargs,
+                )
+            )
+        return sent
@@ -0,0 +1,123 @@
+__all__ = ["CommandRouter", "CommandSpec"]
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from pyrogram import Client
+from pyrogram.filters import Filter
+from pyrogram.handlers import MessageHandler
+from pyrogram.types import Message
+
+# Same argument splitting as `pyrogram.filters.command`
+COMMAND_RE = re.compile(r"([\"'])(.*?)(?<!\\)\1|(\S+)")
+UNESCAPE_RE = re.compile(r"\\([\"'])")
+
+
+@dataclass(frozen=True)
+class CommandSpec:
+    commands: FrozenSet[str]
+    prefixes: FrozenSet[str]
+    case_sensitive: bool = False
+
+    @classmethod
+    def parse(cls, commands, prefixes="/", case_sensitive: bool = False):
+        commands = commands if isinstance(commands, list) else [commands]
+        prefixes = [] if prefixes is None else prefixes
+        prefixes = prefixes if isinstance(prefixes, list) else [prefixes]
+        return cls(
+            commands=frozenset(c if case_sensitive else c.lower() for c in commands),
+            prefixes=frozenset(prefixes or [""]),
+            case_sensitive=case_sensitive,
+        )
+
+
+class CommandRouter(MessageHandler):
+    """Single message handler dispatching every command of one handler group
+
+    The prefix and command are tokenized once per message and the matching
+    handlers are looked up by `(prefix, command)`, so only their remaining
+    filters run instead of one ``filters.command`` per loaded command.
+    """
+
+    def __init__(self, username: Optional[str] = None) -> None:
+        super().__init__(self.__dispatch)
+        self.username = username.lower() if username else None
+        self.sensitive: Dict[Tuple[str, str], List[MessageHandler]] = {}
+        self.insensitive: Dict[Tuple[str, str], List[MessageHandler]] = {}
+        # Longest first so that e.g. "//" wins over "/"
+        self.prefixes: List[str] = []
+
+    def __len__(self) -> int:
+        return sum(map(len, self.sensitive.values())) + sum(
+            map(len, self.insensitive.values())
+        )
+
+    def add(self, callback: Callable, spec: CommandSpec, flt: Optional[Filter] = None):
+        handler = MessageHandler(callback, flt)
+        index = self.sensitive if spec.case_sensitive else self.insensitive
+        for prefix in spec.prefixes:
+            for cmd in spec.commands:
+                index.setdefault((prefix, cmd), []).append(handler)
+        self.prefixes = sorted(
+            {p for p, _ in (*self.sensitive, *self.insensitive)}, key=len, reverse=True
+        )
+        return handler
+
+    def remove(self, callback: Callable) -> None:
+        for index in (self.sensitive, self.insensitive):
+            for key in tuple(index):
+                index[key] = [h for h in index[key] if h.callback != callback]
+                if not index[key]:
+                    del index[key]
+        self.prefixes = sorted(
+            {p for p, _ in (*self.sensitive, *self.insensitive)}, key=len, reverse=True
+        )
+
+    def match(self, text: str) -> Optional[Tuple[str, List[MessageHandler], str]]:
+        """Find handlers for a message text
+
+        Returns:
+        -------
+            `Optional[Tuple[str, List[MessageHandler], str]]`: (command, handlers, arguments)
+        """
+        for prefix in self.prefixes:
+            if not text.startswith(prefix):
+                continue
+            body = text[len(prefix) :]
+            token = body.split(maxsplit=1)[0] if body and not body[0].isspace() else ""
+            if not token:
+                continue
+            cmd, _, username = token.partition("@")
+            if username and username.lower() != self.username:
+                continue
+            args = body[len(token) :]
+            if handlers := self.sensitive.get((prefix, cmd)):
+                return cmd, handlers, args
+            if handlers := self.insensitive.get((prefix, cmd.lower())):
+                return cmd.lower(), handlers, args
+        return None
+
+    async def check(self, client: Client, message: Message) -> bool:
+        text = message.text or message.caption
+        if not text or (found := self.match(text)) is None:
+            return False
+        cmd, handlers, args = found
+        # Where the arguments start (after one separator), `/cmd@bot` included
+        message.args_offset = len(text) - len(args) + (1 if args[:1].isspace() else 0)
+        message.command = [cmd] + [
+            UNESCAPE_RE.sub(r"\1", m.group(2) or m.group(3) or "")
+            for m in COMMAND_RE.finditer(args)
+        ]
+        for handler in handlers:
+            if await handler.check(client, message):
+                message._route = handler.callback
+                return True
+        message.command = None
+        return False
+
+    @staticmethod
+    async def __dispatch(client: Client, message: Message):
+        callback = message._route
+        del message._route
+        return await callback(client, message)
@@ -6,18 +6,21 @@ Coversation Utils
 ~ Inspired by pyromod, Conversation-Pyrogram
 """
 import asyncio
+import inspect
 import logging
-from asyncio.futures import Future
-from collections import OrderedDict
-from functools import partial
-from typing import Dict, List, Optional, Union
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple, Union
 
 import pyrogram
 from pyrogram import Client
-from pyrogram.filters import Filter, create
+from pyrogram.filters import Filter
 from pyrogram.handlers import CallbackQueryHandler, InlineQueryHandler, MessageHandler
 from pyrogram.types import CallbackQuery, InlineQuery, Message
 
+from .metrics import CONVERSATION_TIMEOUTS, CONVERSATIONS
+from .scheduler import delete_in
+
 log = logging.getLogger("Conversation")
 
 
@@ -27,6 +30,171 @@ Handlers = Union[
     CallbackQueryHandler,
     InlineQueryHandler,
 ]
+# (chat_id, user_id), `None` matches any chat / user
+ConvKey = Tuple[Optional[int], Optional[int]]
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class _Waiter:
+    __slots__ = ("future", "filters")
+
+    def __init__(self, future: asyncio.Future, filters: Optional[Filter]) -> None:
+        self.future = future
+        self.filters = filters
+
+    @property
+    def closed(self) -> bool:
+        return self.future.done()
+
+    async def deliver(self, update: Updates) -> None:
+        self.future.set_result(update)
+
+
+class _Stream:
+    """Bounded buffer of a `Conversation.stream` subscription"""
+
+    __slots__ = (
+        "filters",
+        "maxsize",
+        "overflow",
+        "buffer",
+        "dropped",
+        "closed",
+        "last_activity",
+        "_ready",
+        "_space",
+    )
+
+    def __init__(self, filters: Optional[Filter], maxsize: int, overflow: str) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self.filters = filters
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.buffer: Deque[Updates] = deque()
+        self.dropped = 0
+        self.closed = False
+        self.last_activity = time.monotonic()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+
+    async def deliver(self, update: Updates) -> None:
+        self.last_activity = time.monotonic()
+        while len(self.buffer) >= self.maxsize:
+            if self.overflow == "drop_oldest":
+                self.buffer.popleft()
+            elif self.overflow == "drop_newest":
+                self.dropped += 1
+                return
+            else:
+                # "block": hold the dispatcher until the consumer catches up
+                self._space.clear()
+                await self._space.wait()
+                continue
+            self.dropped += 1
+        self.buffer.append(update)
+        self._ready.set()
+
+    async def get(self) -> Optional[Updates]:
+        """Next buffered update, `None` once closed and drained"""
+        while not self.buffer:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        self.last_activity = time.monotonic()
+        self._space.set()
+        return self.buffer.popleft()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+        self._space.set()
+
+
+class ConversationRouter:
+    """One permanent handler per update type dispatching to waiting conversations
+
+    Waiters are indexed by `(chat_id, user_id)`, so an update only runs the
+    filters of conversations in its own chat.
+    """
+
+    hndlr_grp = -float("inf")
+
+    def __init__(self, client: Client) -> None:
+        self.client = client
+        self.waiters: Dict[type, Dict[ConvKey, List[_Waiter]]] = {
+            MessageHandler: {},
+            CallbackQueryHandler: {},
+            InlineQueryHandler: {},
+        }
+        dispatcher = client.dispatcher
+        if self.hndlr_grp not in dispatcher.groups:
+            dispatcher.groups[self.hndlr_grp] = []
+            dispatcher.groups = OrderedDict(sorted(dispatcher.groups.items()))
+        for hndlr in self.waiters:
+            dispatcher.groups[self.hndlr_grp].append(hndlr(self.__route))
+
+    @classmethod
+    def get(cls, client: Client) -> "ConversationRouter":
+        if (router := getattr(client, "_conv_router", None)) is None:
+            router = client._conv_router = cls(client)
+        return router
+
+    def add(self, hndlr: type, key: ConvKey, waiter: Union[_Waiter, _Stream]) -> None:
+        self.waiters[hndlr].setdefault(key, []).append(waiter)
+
+    def remove(
+        self, hndlr: type, key: ConvKey, waiter: Union[_Waiter, _Stream]
+    ) -> None:
+        if waiters := self.waiters[hndlr].get(key):
+            try:
+                waiters.remove(waiter)
+            except ValueError:
+                pass
+            if not waiters:
+                del self.waiters[hndlr][key]
+
+    @staticmethod
+    def keys(update: Updates) -> Tuple[type, List[ConvKey]]:
+        user_id = update.from_user.id if update.from_user else None
+        if isinstance(update, Message):
+            hndlr, chat_id = MessageHandler, update.chat.id
+        elif isinstance(update, CallbackQuery):
+            hndlr = CallbackQueryHandler
+            chat_id = update.message.chat.id if update.message else None
+        else:
+            hndlr, chat_id = InlineQueryHandler, None
+        return hndlr, [(chat_id, user_id), (chat_id, None)]
+
+    async def __check(self, flt: Optional[Filter], update: Updates) -> bool:
+        if flt is None:
+            return True
+        if inspect.iscoroutinefunction(flt.__call__):
+            return await flt(self.client, update)
+        return await self.client.loop.run_in_executor(
+            self.client.executor, flt, self.client, update
+        )
+
+    async def __route(self, _, update: Updates) -> None:
+        hndlr, keys = self.keys(update)
+        index = self.waiters[hndlr]
+        if not index:
+            return
+        if hndlr is CallbackQueryHandler and keys[0][0] is None:
+            # Callback from an inline message, not bound to any chat
+            candidates = [w for waiters in index.values() for w in waiters]
+        else:
+            candidates = [w for key in keys for w in index.get(key, ())]
+        for waiter in candidates:
+            if waiter.closed:
+                continue
+            try:
+                if await self.__check(waiter.filters, update):
+                    await waiter.deliver(update)
+                    return
+            except Exception as e:
+                log.error(e, exc_info=True)
 
 
 class ConversationAlreadyExists(Exception):
@@ -35,7 +203,7 @@ class ConversationAlreadyExists(Exception):
 
 class Conversation:
 
-    convo_dict: Dict[str, Union[Future, Handlers]] = {}
+    convo_dict: Dict[ConvKey, "Conversation"] = {}
 
     def __init__(
         self,
@@ -43,6 +211,7 @@ class Conversation:
         chat_id: int,
         timeout: float = 30.0,
         loop: Optional[asyncio.AbstractEventLoop] = None,
+        user_id: Optional[int] = None,
     ) -> None:
         """Initiate a conversation
 
@@ -52,26 +221,33 @@ class Conversation:
             - chat_id (`int`): Chat ID of the chat to start conversation in.
             - timeout (`float`, optional): Response wait time. (Defaults to `30.0`)
             - loop (`Optional[asyncio.AbstractEventLoop]`, optional): Current event loop (Defaults to `None`)
+            - user_id (`Optional[int]`, optional): Only listen to this user,
+                allows one conversation per user in the same chat. (Defaults to `None`)
 
         Raises:
         ------
-            `ConversationAlreadyExists`: In case of existing conv. in the same chat.
+            `ConversationAlreadyExists`: In case of existing conv. with the same chat and user.
         """
 
-        if chat_id in self.convo_dict:
-            raise ConversationAlreadyExists(f"Chat ID => {chat_id}")
+        if (chat_id, user_id) in self.convo_dict:
+            raise ConversationAlreadyExists(
+                f"Chat ID => {chat_id}, User ID => {user_id}"
+            )
 
         self.client = client
         self.chat_id = chat_id
+        self.user_id = user_id
         self.timeout = timeout
         self.loop = loop or asyncio.get_running_loop()
-        self.lock = asyncio.Lock()
-        self.hndlr_grp = -float("inf")
+
+    @property
+    def key(self) -> ConvKey:
+        return self.chat_id, self.user_id
 
     @property
     def isactive(self) -> bool:
         """check for active Conversation"""
-        return self.chat_id in self.convo_dict
+        return self.convo_dict.get(self.key) is self
 
     async def send(
         self,
@@ -120,7 +296,7 @@ class Conversation:
                 ]`, optional):
                 Additional interface options. An object for an inline keyboard, custom reply keyboard,
                 instructions to remove reply keyboard or to force a reply from the user. (Defaults to `None`)
-            - del_in (`float`, optional): message delete time in sec. (Defaults to `0.0`)
+            - del_in (`float`, optional): message delete time in sec, deleted in the background. (Defaults to `0.0`)
 
         Returns:
         -------
@@ -140,8 +316,7 @@ class Conversation:
         )
 
         if isinstance(del_in, (int, float)) and del_in > 0:
-            await asyncio.sleep(del_in)
-            await msg.delete()
+            delete_in(del_in, msg)
         return msg
 
     async def listen(
@@ -161,14 +336,7 @@ class Conversation:
         -------
             `Optional[Message]`: On Success
         """
-        conv_filter = create(
-            lambda _, __, m: ((m.chat.id == self.chat_id) and self.isactive)
-        )
-        return await self.__listen(
-            MessageHandler,
-            ((conv_filter & filters) if filters is not None else conv_filter),
-            timeout,
-        )
+        return await self.__listen(MessageHandler, self.key, filters, timeout)
 
     listen_message = listen
 
@@ -189,15 +357,7 @@ class Conversation:
         -------
             `Optional[CallbackQuery]`: On Success
         """
-        conv_filter = create(
-            lambda _, __, cb: (not cb.message or (cb.message.chat.id == self.chat_id))
-            and self.isactive
-        )
-        return await self.__listen(
-            CallbackQueryHandler,
-            ((conv_filter & filters) if filters is not None else conv_filter),
-            timeout,
-        )
+        return await self.__listen(CallbackQueryHandler, self.key, filters, timeout)
 
     async def listen_inline(
         self,
@@ -216,22 +376,85 @@ class Conversation:
         -------
             `Optional[InlineQuery]`: On Success
         """
-        conv_filter = create(lambda _, __, ___: self.isactive)
         return await self.__listen(
-            InlineQueryHandler,
-            ((conv_filter & filters) if filters is not None else conv_filter),
-            timeout,
+            InlineQueryHandler, (None, self.user_id), filters, timeout
         )
 
+    async def stream(
+        self,
+        filters: Optional[Filter] = None,
+        idle_timeout: Optional[float] = None,
+        maxsize: int = 100,
+        overflow: str = "drop_oldest",
+        updates: str = "message",
+    ) -> AsyncIterator[Updates]:
+        """Iterate over responses with one subscription for the whole session
+
+        Updates arriving while the previous one is being processed are buffered.
+
+        Parameters:
+        ----------
+            - filters (`Optional[Filter]`, optional): Pass one or more filters to allow only a subset
+                of messages to be passed in your callback function. (Defaults to `None`)
+            - idle_timeout (`Optional[float]`, optional): End the stream after this long without
+                any update. (Defaults to `self.timeout`)
+            - maxsize (`int`, optional): Max. buffered updates. (Defaults to `100`)
+            - overflow (`str`, optional): What to do on a full buffer, one of "drop_oldest",
+                "drop_newest" or "block". (Defaults to `"drop_oldest"`)
+            - updates (`str`, optional): "message", "callback" or "inline". (Defaults to `"message"`)
+
+        Yields:
+        ------
+            `Updates`: Matching updates, in order of arrival
+        """
+        hndlr = {
+            "message": MessageHandler,
+            "callback": CallbackQueryHandler,
+            "inline": InlineQueryHandler,
+        }[updates]
+        key = (None, self.user_id) if hndlr is InlineQueryHandler else self.key
+        idle_timeout = idle_timeout or self.timeout
+        sub = _Stream(filters, maxsize, overflow)
+        router = ConversationRouter.get(self.client)
+
+        def check_idle() -> None:
+            nonlocal timer
+            if (left := sub.last_activity + idle_timeout - time.monotonic()) > 0:
+                timer = self.loop.call_later(left, check_idle)
+            else:
+                log.info(
+                    f"Stream idle, ending conversation in Chat ID => {self.chat_id}"
+                )
+                sub.close()
+
+        timer = self.loop.call_later(idle_timeout, check_idle)
+        router.add(hndlr, key, sub)
+        try:
+            while (update := await sub.get()) is not None:
+                yield update
+        finally:
+            timer.cancel()
+            sub.close()
+            router.remove(hndlr, key, sub)
+            if sub.dropped:
+                log.warning(
+                    f"Stream dropped {sub.dropped} update(s) in Chat ID => {self.chat_id}"
+                )
+
     async def __listen(
-        self, hndlr: Handlers, flt: Filter, timeout: Optional[float]
+        self,
+        hndlr: Handlers,
+        key: ConvKey,
+        flt: Optional[Filter],
+        timeout: Optional[float],
     ) -> Optional[Updates]:
-        """Listen for handlers
+        """Wait for an update routed by the `ConversationRouter`
 
         Parameters:
         ----------
-            - hndlr (`Handlers`): The handler to be registered.
-            - flt (`Filter`): Pass one or more filters to allow only a subset
+            - hndlr (`Handlers`): Type of update to wait for.
+            - key (`ConvKey`): (chat_id, user_id) to wait in.
+            - flt (`Optional[Filter]`): Pass one or more filters to allow only a subset
                 of messages to be passed in your callback function.
             - timeout (`Optional[float]`): Response wait time. (Defaults to `self.timeout`)
 
@@ -239,14 +462,13 @@ class Conversation:
         -------
             `Optional[Updates]`: On Success
         """
-        fut = self.loop.create_future()
-        fut.add_done_callback(partial(self.__unregister_handler))
-        conv_handler = hndlr(lambda _, u: fut.set_result(u), flt)
-        await self.__register_handler(conv_handler)
-        self.convo_dict[self.chat_id] = dict(handler=conv_handler, future=fut)
+        router = ConversationRouter.get(self.client)
+        waiter = _Waiter(self.loop.create_future(), flt)
+        router.add(hndlr, key, waiter)
         try:
-            return await asyncio.wait_for(fut, timeout or self.timeout)
+            return await asyncio.wait_for(waiter.future, timeout or self.timeout)
         except asyncio.TimeoutError:
+            CONVERSATION_TIMEOUTS.inc()
             log.error(
                 (
                     "Ended conversation, 🕐 Timeout reached !"
@@ -255,47 +477,20 @@ class Conversation:
                 )
             )
         finally:
-            if not fut.done():
-                fut.cancel()
-
-    async def __register_handler(self, hndlr: Handlers) -> None:
-        """Register Conversation handler
-
-        Parameters:
-        ----------
-            - hndlr (`Handlers`): The handler to be registered.
-        """
-        dispatcher = self.client.dispatcher
-        async with self.lock:
-            if self.hndlr_grp not in dispatcher.groups:
-                dispatcher.groups[self.hndlr_grp] = []
-                dispatcher.groups = OrderedDict(sorted(dispatcher.groups.items()))
-            dispatcher.groups[self.hndlr_grp].append(hndlr)
-
-    def __unregister_handler(self, *_) -> None:
-        """Unregister Conversation handler"""
-        if not self.isactive:
-            log.warning(f"No active Conversations found in Chat ID => {self.chat_id}")
-            return
-
-        async def func() -> None:
-            if hndlr := self.convo_dict[self.chat_id].get("handler"):
-                dispatcher = self.client.dispatcher
-                async with self.lock:
-                    if self.hndlr_grp not in dispatcher.groups:
-                        log.warning(
-                            f"Group {self.hndlr_grp} does not exist. Handler was not removed."
-                        )
-                        return
-                    dispatcher.groups[self.hndlr_grp].remove(hndlr)
-                self.convo_dict.pop(self.chat_id, None)
-
-        self.loop.create_task(func())
+            router.remove(hndlr, key, waiter)
 
     async def __aenter__(self) -> "Conversation":
         if not isinstance(self.chat_id, int):
             self.chat_id = (await self.client.get_chat(self.chat_id)).id
+        if self.key in self.convo_dict:
+            raise ConversationAlreadyExists(
+                f"Chat ID => {self.chat_id}, User ID => {self.user_id}"
+            )
+        self.convo_dict[self.key] = self
+        CONVERSATIONS.inc()
         return self
 
     async def __aexit__(self, *_, **__) -> None:
-        self.convo_dict.pop(self.chat_id, None)
+        if self.isactive:
+            self.convo_dict.pop(self.key, None)
+            CONVERSATIONS.dec()
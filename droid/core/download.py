@@ -0,0 +1,208 @@
+__all__ = ["Download", "Progress"]
+
+import asyncio
+import hashlib
+import inspect
+import os
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Set, Tuple
+
+import ujson
+from aiohttp import ClientSession, ClientTimeout
+
+from ..utils import run_in_pool, run_sync
+
+# progress(downloaded, total), total is 0 if unknown
+Progress = Callable[[int, int], Any]
+
+
+@run_sync(pool="cpu")
+def _file_digest(path: Path, algo: str) -> str:
+    digest = hashlib.new(algo)
+    with path.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Download:
+    """Streaming, resumable and optionally segmented file download
+
+    Data goes to ``<dest>.part``, the progress of every segment is kept in
+    ``<dest>.part.json`` so an interrupted download continues with `Range`
+    requests (guarded by `If-Range`) instead of starting over.
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        url: str,
+        dest: Path,
+        segments: int = 1,
+        chunk_size: int = 1 << 16,
+        progress: Optional[Progress] = None,
+        progress_interval: float = 1.0,
+        timeout: Optional[ClientTimeout] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.session = session
+        self.url = url
+        self.dest = dest
+        self.part = dest.with_name(dest.name + ".part")
+        self.state_file = dest.with_name(dest.name + ".part.json")
+        self.segments = max(segments, 1)
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.timeout = timeout or ClientTimeout(total=None, sock_read=60)
+        self.headers = headers or {}
+        self.total = 0
+        self.validator: Optional[str] = None
+        # [start, end, done] per segment, `end` is inclusive (-1 if unknown)
+        self.ranges: List[List[int]] = []
+        self._last_report = 0.0
+        # Open .part handles, flushed before the state is saved
+        self._files: Set[BinaryIO] = set()
+        # Keeps state saves in order, they run on the io pool
+        self._save_lock = asyncio.Lock()
+
+    @property
+    def downloaded(self) -> int:
+        return sum(done for _, _, done in self.ranges)
+
+    async def _probe(self) -> Tuple[int, bool, Optional[str]]:
+        """(length, accepts ranges, validator) of the remote file"""
+        headers = {**self.headers, "Range": "bytes=0-0"}
+        async with self.session.get(
+            self.url, headers=headers, timeout=self.timeout
+        ) as resp:
+            if resp.status not in (200, 206):
+                raise ValueError(f"HTTP Status: {resp.status} - URL [{self.url}]")
+            validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+            if resp.status == 206 and (c_range := resp.headers.get("Content-Range")):
+                # bytes 0-0/12345
+                length = c_range.rpartition("/")[2]
+                return (int(length) if length.isdigit() else 0), True, validator
+            return resp.content_length or 0, False, validator
+
+    def _load_state(self, total: int, validator: Optional[str]) -> bool:
+        if not (self.part.is_file() and self.state_file.is_file()):
+            return False
+        try:
+            state = ujson.loads(self.state_file.read_text())
+        except ValueError:
+            return False
+        if state.get("total") != total or state.get("validator") != validator:
+            return False
+        self.ranges = state["ranges"]
+        return True
+
+    def _save_state(self, files: List[BinaryIO], state: str) -> None:
+        # The state must not count bytes still sitting in a buffer
+        for f in files:
+            f.flush()
+        self.state_file.write_text(state)
+
+    def _plan(self, total: int, ranges_ok: bool) -> None:
+        n = self.segments if (ranges_ok and total) else 1
+        # Not worth splitting below 1 MiB per segment
+        n = max(min(n, total // (1 << 20)), 1)
+        size = total // n if total else 0
+        self.ranges = [
+            [i * size, (total - 1) if i == n - 1 else ((i + 1) * size - 1), 0]
+            for i in range(n)
+        ]
+        if not total:
+            self.ranges = [[0, -1, 0]]
+
+    async def _report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_report < self.progress_interval:
+            return
+        self._last_report = now
+        async with self._save_lock:
+            state = ujson.dumps(
+                dict(total=self.total, validator=self.validator, ranges=self.ranges)
+            )
+            await run_in_pool("io", self._save_state, list(self._files), state)
+        if self.progress is not None:
+            out = self.progress(self.downloaded, self.total)
+            if inspect.isawaitable(out):
+                await out
+
+    async def _fetch_segment(self, seg: List[int], ranges_ok: bool) -> None:
+        start, end, done = seg
+        if end != -1 and start + done > end:
+            return
+        headers = dict(self.headers)
+        if ranges_ok and (done or len(self.ranges) > 1):
+            headers["Range"] = f"bytes={start + done}-{'' if end == -1 else end}"
+            if self.validator:
+                headers["If-Range"] = self.validator
+        async with self.session.get(
+            self.url, headers=headers, timeout=self.timeout
+        ) as resp:
+            # Only a fresh single stream wants the whole file, whether or not
+            # Range / If-Range was sent (ranges may be gone since last time)
+            if resp.status == 200 and (done or len(self.ranges) > 1):
+                if len(self.ranges) > 1:
+                    raise ValueError(
+                        f"Range request got the whole file (remote changed?) - URL [{self.url}]"
+                    )
+                # Single stream: start over
+                seg[2] = done = 0
+            elif resp.status not in (200, 206):
+                raise ValueError(f"HTTP Status: {resp.status} - URL [{self.url}]")
+            with self.part.open("r+b") as f:
+                self._files.add(f)
+                try:
+                    f.seek(start + done)
+                    async for chunk in resp.content.iter_chunked(self.chunk_size):
+                        if end != -1:
+                            chunk = chunk[: end + 1 - (start + seg[2])]
+                        await run_in_pool("io", f.write, chunk)
+                        seg[2] += len(chunk)
+                        await self._report()
+                        if end != -1 and start + seg[2] > end:
+                            break
+                    if end == -1:
+                        await run_in_pool("io", f.truncate)
+                finally:
+                    # Not while a save may be flushing it
+                    async with self._save_lock:
+                        self._files.discard(f)
+
+    async def run(self, checksum: Optional[Tuple[str, str]] = None) -> Path:
+        total, ranges_ok, validator = await self._probe()
+        if not self._load_state(total, validator):
+            self._plan(total, ranges_ok)
+            with self.part.open("wb") as f:
+                if total:
+                    f.truncate(total)
+        self.total, self.validator = total, validator
+        try:
+            await asyncio.gather(
+                *(self._fetch_segment(seg, ranges_ok) for seg in self.ranges)
+            )
+        finally:
+            await self._report(force=True)
+
+        size = self.part.stat().st_size
+        if (total and (size != total or self.downloaded != total)) or (
+            not total and size != self.downloaded
+        ):
+            raise ValueError(
+                f"Size mismatch: got {size} of {total or self.downloaded} bytes - URL [{self.url}]"
+            )
+        if checksum:
+            algo, expected = checksum
+            if (digest := await _file_digest(self.part, algo)) != expected.lower():
+                self.state_file.unlink()
+                self.part.unlink()
+                raise ValueError(
+                    f"{algo} mismatch: expected {expected}, got {digest} - URL [{self.url}]"
+                )
+        os.replace(self.part, self.dest)
+        self.state_file.unlink()
+        return self.dest
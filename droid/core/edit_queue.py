@@ -0,0 +1,134 @@
+__all__ = ["EditCoalescer"]
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from pyrogram.errors import MessageNotModified
+
+EditCall = Callable[[], Awaitable[Any]]
+# No edit applied yet, equal to no signature
+_NONE = object()
+
+
+class _Slot:
+    __slots__ = ("call", "signature", "waiters", "task")
+
+    def __init__(self) -> None:
+        self.call: Optional[EditCall] = None
+        self.signature: Hashable = None
+        self.waiters: List[asyncio.Future] = []
+        self.task: Optional[asyncio.Task] = None
+
+
+class EditCoalescer:
+    """Per-message edit queue keeping only the latest pending edit
+
+    An edit equal to the one applied just before it in the same burst (the
+    edits queued while the previous one was being paced) is skipped, its
+    callers get `MessageNotModified` like Telegram would raise. Nothing is
+    compared with older edits, the message may have changed since.
+
+    Parameters:
+    ----------
+        - interval (`float`, optional): Min. seconds between two edits of a message. (Defaults to `1.0`)
+        - max_size (`int`, optional): Max. messages to remember the last edit time of. (Defaults to `1024`)
+    """
+
+    def __init__(self, interval: float = 1.0, max_size: int = 1024) -> None:
+        self.interval = interval
+        self.max_size = max_size
+        self._slots: Dict[Hashable, _Slot] = {}
+        # key -> time of the last edit, for pacing
+        self._last: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.submitted = 0
+        self.applied = 0
+        self.coalesced = 0
+        self.unchanged = 0
+
+    def submit(
+        self, key: Hashable, call: EditCall, signature: Hashable
+    ) -> asyncio.Future:
+        """Queue an edit, replacing any pending edit of the same message
+
+        Parameters:
+        ----------
+            - key (`Hashable`): Message key e.g. (chat_id, message_id).
+            - call (`EditCall`): Coroutine function applying the edit.
+            - signature (`Hashable`): Content of the edit, equal signatures are not re-applied.
+
+        Returns:
+        -------
+            `asyncio.Future`: Resolves with the result of the edit that finally got applied
+            (`MessageNotModified` if it was skipped as unchanged)
+        """
+        self.submitted += 1
+        if (slot := self._slots.get(key)) is None:
+            slot = self._slots[key] = _Slot()
+        if slot.call is not None:
+            self.coalesced += 1
+        slot.call, slot.signature = call, signature
+        fut = asyncio.get_running_loop().create_future()
+        slot.waiters.append(fut)
+        if slot.task is None:
+            slot.task = asyncio.create_task(self._flush(key, slot))
+        return fut
+
+    async def _flush(self, key: Hashable, slot: _Slot) -> None:
+        waiters: List[asyncio.Future] = []
+        # Signature of the last edit applied by this burst
+        last_sig: Hashable = _NONE
+        try:
+            while slot.call is not None:
+                flushed_at = self._last.get(key, 0.0)
+                if (delay := flushed_at + self.interval - time.monotonic()) > 0:
+                    await asyncio.sleep(delay)
+                call, signature, waiters = slot.call, slot.signature, slot.waiters
+                slot.call, slot.waiters = None, []
+                try:
+                    if signature == last_sig:
+                        raise MessageNotModified()
+                    result = await call()
+                except Exception as e:
+                    if isinstance(e, MessageNotModified):
+                        self.unchanged += 1
+                    for fut in waiters:
+                        if not fut.done():
+                            fut.set_exception(e)
+                            # Retrieved, a caller may have gone away
+                            fut.exception()
+                    continue
+                finally:
+                    if signature != last_sig:
+                        self._remember(key)
+                self.applied += 1
+                last_sig = signature
+                for fut in waiters:
+                    if not fut.done():
+                        fut.set_result(result)
+        finally:
+            for fut in waiters + slot.waiters:
+                if not fut.done():
+                    fut.cancel()
+            self._slots.pop(key, None)
+
+    def _remember(self, key: Hashable) -> None:
+        self._last[key] = time.monotonic()
+        self._last.move_to_end(key)
+        while len(self._last) > self.max_size:
+            self._last.popitem(last=False)
+
+    @property
+    def pending(self) -> int:
+        return len(self._slots)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            pending=self.pending,
+            submitted=self.submitted,
+            applied=self.applied,
+            coalesced=self.coalesced,
+            unchanged=self.unchanged,
+        )
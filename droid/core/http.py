@@ -1,16 +1,136 @@
+import asyncio
 import logging
-from typing import Any, Dict, Optional, Union
+import time
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple, Union
+from urllib.parse import unquote, urlparse
 
 import ujson
-from aiohttp import ClientSession, ClientTimeout
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
 from aiohttp.client_exceptions import ContentTypeError
 
+from ..config import CONFIG
+from .download import Download, Progress
+from .metrics import HTTP_LATENCY
+
 LOG = logging.getLogger(__name__)
+# A request argument which can't be part of a cache key
+_OPAQUE = object()
+
+
+def _copy(body: Any) -> Any:
+    """Copy of a decoded JSON body, so a caller can't change what others get"""
+    if isinstance(body, dict):
+        return {k: _copy(v) for k, v in body.items()}
+    if isinstance(body, list):
+        return [_copy(v) for v in body]
+    return body
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "last_modified", "expires")
+
+    def __init__(
+        self, body: Any, etag: Optional[str], last_modified: Optional[str], ttl: float
+    ) -> None:
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = time.monotonic() + ttl
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires > time.monotonic()
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """LRU cache of decoded JSON responses
+
+    ~ Cached bodies are shared, callers get a copy (see `_copy`).
+    """
+
+    def __init__(self, max_size: int = 256) -> None:
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.revalidating: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stale_served = 0
+
+    @classmethod
+    def key(cls, url: str, kwargs: Dict[str, Any]) -> Optional[str]:
+        """Identity of a request, `None` if it can't be told (e.g. a stream as ``data``)
+
+        Every request argument counts (``auth``, ``cookies``, ``json`` ...), except
+        ``timeout``.
+        """
+        key = url
+        for arg, value in sorted(kwargs.items()):
+            if arg == "timeout" or value is None:
+                continue
+            if (value := cls._plain(value)) is _OPAQUE:
+                return None
+            key += f"|{arg}={value!r}"
+        return key
+
+    @classmethod
+    def _plain(cls, value: Any) -> Any:
+        if isinstance(value, (str, bytes, int, float, bool, type(None))):
+            return value
+        if isinstance(value, Mapping):
+            items = [(k, cls._plain(v)) for k, v in value.items()]
+            if any(v is _OPAQUE for _, v in items):
+                return _OPAQUE
+            return sorted(items, key=repr)
+        if isinstance(value, (list, tuple)):
+            # Tuples include named ones, e.g. `BasicAuth`
+            items = [cls._plain(v) for v in value]
+            return _OPAQUE if _OPAQUE in items else (type(value).__name__, items)
+        return _OPAQUE
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        if (entry := self.entries.get(key)) is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            size=len(self.entries),
+            hits=self.hits,
+            misses=self.misses,
+            revalidated=self.revalidated,
+            stale_served=self.stale_served,
+        )
 
 
 class Http:
     def __init__(self) -> None:
         self.session: Optional[ClientSession] = None
+        self.http_cache = ResponseCache(CONFIG.http_cache_size)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.http_coalesced = 0
         super().__init__()
 
     @property
@@ -25,7 +145,52 @@ class Http:
 
     @staticmethod
     def new_session() -> ClientSession:
-        return ClientSession(json_serialize=ujson.dumps)
+        return ClientSession(
+            connector=TCPConnector(
+                limit=CONFIG.http_pool_limit,
+                limit_per_host=CONFIG.http_pool_limit_per_host,
+                keepalive_timeout=CONFIG.http_keepalive,
+                ttl_dns_cache=CONFIG.http_dns_ttl,
+                use_dns_cache=CONFIG.http_dns_ttl > 0,
+            ),
+            json_serialize=ujson.dumps,
+        )
+
+    @property
+    def http_stats(self) -> Dict[str, Any]:
+        """Connection pool, request coalescing and response cache stats"""
+        stats = dict(
+            inflight=len(self._inflight),
+            coalesced=self.http_coalesced,
+            cache=self.http_cache.stats,
+        )
+        if self.has_session:
+            connector = self.session.connector
+            stats.update(
+                pool_limit=connector.limit,
+                pool_in_use=len(getattr(connector, "_acquired", ())),
+                pool_idle=sum(map(len, getattr(connector, "_conns", {}).values())),
+            )
+        return stats
+
+    async def _single_flight(
+        self, key: str, factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Share one in-flight ``factory()`` between concurrent identical requests"""
+        if (task := self._inflight.get(key)) is not None:
+            self.http_coalesced += 1
+        else:
+            # A task of its own, so a cancelled caller doesn't cancel the others
+            task = self._inflight[key] = asyncio.ensure_future(factory())
+            task.add_done_callback(partial(self._landed, key))
+        return await asyncio.shield(task)
+
+    def _landed(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Avoid "exception was never retrieved" if every caller went away
+        if not task.cancelled():
+            task.exception()
 
     async def close_session(self) -> None:
         if self.has_session:
@@ -36,20 +201,158 @@ class Http:
         url: str,
         timeout: Union[ClientTimeout, float] = 10.0,
         ignore_errors: bool = False,
+        cache_ttl: Optional[float] = None,
+        stale_while_revalidate: bool = False,
         **kwargs: Any,
     ) -> Optional[Dict[str, Any]]:
+        """GET a JSON response
+
+        Parameters:
+        ----------
+            - url (`str`): URL.
+            - timeout (`Union[ClientTimeout, float]`, optional): Request timeout. (Defaults to `10.0`)
+            - ignore_errors (`bool`, optional): Log errors and return `None` instead of raising. (Defaults to `False`)
+            - cache_ttl (`Optional[float]`, optional): Cache the response for this many seconds, expired
+                responses are revalidated with ETag / Last-Modified. (Defaults to `None`)
+            - stale_while_revalidate (`bool`, optional): Return an expired cached response at once
+                and revalidate it in the background. (Defaults to `False`)
+
+        Returns:
+        -------
+            `Optional[Dict[str, Any]]`: Decoded JSON, a copy of its own for every caller.
+        """
         if isinstance(timeout, (float, int)):
             timeout = ClientTimeout(total=timeout)
         kwargs["timeout"] = timeout
         try:
-            async with self.http.get(url, **kwargs) as resp:
-                if resp.status != 200:
-                    raise ValueError(f"HTTP Status: {resp.status} - URL [{url}]")
-                try:
-                    return await resp.json(loads=ujson.loads)
-                except ContentTypeError:
-                    return ujson.loads(await resp.text())
+            cache = self.http_cache
+            if (key := cache.key(url, kwargs)) is None:
+                # Not comparable with other requests
+                return await self._fetch_body(url, **kwargs)
+            if not cache_ttl:
+                # Same result (the body) as the cached path, they share the key
+                return _copy(
+                    await self._single_flight(
+                        key, lambda: self._fetch_body(url, **kwargs)
+                    )
+                )
+            if (entry := cache.get(key)) is not None:
+                if entry.fresh:
+                    cache.hits += 1
+                    return _copy(entry.body)
+                if stale_while_revalidate:
+                    cache.stale_served += 1
+                    if key not in cache.revalidating:
+                        # Referenced until done, errors are logged by the callback
+                        task = cache.revalidating[key] = asyncio.create_task(
+                            self._revalidate(key, url, cache_ttl, kwargs)
+                        )
+                        task.add_done_callback(partial(self._revalidated, key, url))
+                    return _copy(entry.body)
+            cache.misses += 1
+            return _copy(
+                await self._single_flight(
+                    key, lambda: self._revalidate(key, url, cache_ttl, kwargs)
+                )
+            )
         except Exception as e:
             if not ignore_errors:
                 raise e
             LOG.exception(f"{e}: {e.__class__.__name__}")
+
+    async def download(
+        self,
+        url: str,
+        dest: Union[str, Path, None] = None,
+        segments: int = 1,
+        progress: Optional[Progress] = None,
+        progress_interval: float = 1.0,
+        checksum: Optional[Tuple[str, str]] = None,
+        **kwargs: Any,
+    ) -> Path:
+        """Stream a file to disk, resuming an earlier interrupted download
+
+        Parameters:
+        ----------
+            - url (`str`): URL.
+            - dest (`Union[str, Path, None]`, optional): File path, relative paths are
+                put under `CONFIG.down_path`. (Defaults to the URL file name)
+            - segments (`int`, optional): Parallel ranged requests, if the server supports them. (Defaults to `1`)
+            - progress (`Optional[Progress]`, optional): Called (or awaited) with (downloaded, total). (Defaults to `None`)
+            - progress_interval (`float`, optional): Min. seconds between progress calls. (Defaults to `1.0`)
+            - checksum (`Optional[Tuple[str, str]]`, optional): (hashlib algorithm, hex digest) to verify. (Defaults to `None`)
+
+        Raises:
+        ------
+            `ValueError`: On a bad HTTP status, size or checksum mismatch.
+
+        Returns:
+        -------
+            `Path`: The downloaded file
+        """
+        if dest is None:
+            dest = unquote(Path(urlparse(url).path).name) or "download"
+        if not (dest := Path(dest)).is_absolute():
+            dest = CONFIG.down_path / dest
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        return await Download(
+            self.http,
+            url,
+            dest,
+            segments=segments,
+            progress=progress,
+            progress_interval=progress_interval,
+            **kwargs,
+        ).run(checksum=checksum)
+
+    async def _revalidate(
+        self, key: str, url: str, ttl: float, kwargs: Dict[str, Any]
+    ) -> Any:
+        cache = self.http_cache
+        entry = cache.get(key)
+        body, headers = await self._fetch_json(url, entry, **kwargs)
+        if headers is None:
+            # 304 Not Modified
+            cache.revalidated += 1
+            body = entry.body
+        etag, last_modified = (
+            (entry.etag, entry.last_modified) if entry else (None, None)
+        )
+        if headers is not None:
+            etag = headers.get("ETag") or etag
+            last_modified = headers.get("Last-Modified") or last_modified
+        cache.set(key, CacheEntry(body, etag, last_modified, ttl))
+        return body
+
+    def _revalidated(self, key: str, url: str, task: asyncio.Task) -> None:
+        """Done callback of a background revalidation"""
+        if self.http_cache.revalidating.get(key) is task:
+            del self.http_cache.revalidating[key]
+        if not task.cancelled() and (e := task.exception()) is not None:
+            LOG.warning(f"Revalidating [{url}] failed - {e}: {e.__class__.__name__}")
+
+    async def _fetch_body(self, url: str, **kwargs: Any) -> Any:
+        return (await self._fetch_json(url, **kwargs))[0]
+
+    async def _fetch_json(
+        self, url: str, entry: Optional[CacheEntry] = None, **kwargs: Any
+    ) -> Tuple[Any, Optional[Dict[str, str]]]:
+        """(body, response headers), headers are `None` on a 304 for ``entry``"""
+        if entry is not None:
+            kwargs["headers"] = {**entry.validators, **(kwargs.get("headers") or {})}
+        start = time.perf_counter()
+        async with self.http.get(url, **kwargs) as resp:
+            HTTP_LATENCY.observe(
+                urlparse(url).hostname or "",
+                str(resp.status),
+                value=time.perf_counter() - start,
+            )
+            if resp.status == 304 and entry is not None:
+                return None, None
+            if resp.status != 200:
+                raise ValueError(f"HTTP Status: {resp.status} - URL [{url}]")
+            try:
+                body = await resp.json(loads=ujson.loads)
+            except ContentTypeError:
+                body = ujson.loads(await resp.text())
+            return body, {h: resp.headers.get(h) for h in ("ETag", "Last-Modified")}
@@ -0,0 +1,60 @@
+__all__ = ["INFLIGHT", "InflightTracker"]
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Set, Tuple
+
+LOG = logging.getLogger(__name__)
+
+
+class InflightTracker:
+    """Handler calls currently running, so that shutdown can drain them
+
+    Every call runs as its own task (awaited by the dispatcher worker), which
+    lets a drain cancel a stuck handler without killing pyrogram's workers.
+    """
+
+    def __init__(self) -> None:
+        self.tasks: Set[asyncio.Task] = set()
+        self.accepting = True
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    async def run(self, aw: Awaitable[Any]) -> Any:
+        task = asyncio.ensure_future(aw)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if not task.done():
+                # The worker itself was cancelled
+                task.cancel()
+                raise
+            if self.accepting:
+                raise
+            # Cancelled by `drain`
+
+    async def drain(self, timeout: float) -> Tuple[int, int]:
+        """Stop accepting new calls, wait up to ``timeout`` then cancel the rest
+
+        Returns:
+        -------
+            `Tuple[int, int]`: (finished, cancelled)
+        """
+        self.accepting = False
+        if not (pending := set(self.tasks)):
+            return 0, 0
+        LOG.info(f"Waiting up to {timeout}s for {len(pending)} running handlers...")
+        done, pending = await asyncio.wait(pending, timeout=max(timeout, 0))
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Give them a moment to run their cleanup
+            await asyncio.wait(pending, timeout=1)
+        return len(done), len(pending)
+
+
+INFLIGHT = InflightTracker()
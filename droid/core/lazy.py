@@ -0,0 +1,273 @@
+__all__ = ["ClassManifest", "LazyModule", "scan_manifest"]
+
+"""
+Lazy modules
+
+~ Handler metadata is read from the module source (decorator arguments must be
+  literals), the module itself is imported on its first trigger or warm-up.
+"""
+import ast
+import asyncio
+import builtins
+import importlib
+import inspect
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .. import decor, mod
+from ..utils import run_in_pool
+from .metrics import MODULE_LOAD_SECONDS
+
+# Decorators whose arguments fully describe the trigger, `OnFlt` takes arbitrary filters
+LAZY_DECORATORS = ("OnCmd", "OnCallback", "OnInline")
+# Names allowed in decorator arguments (e.g. flag schemas)
+_BUILTINS = {"int": int, "float": float, "bool": bool, "str": str}
+# Decorators of async methods which don't register anything
+_PLAIN_DECORATORS = ("staticmethod", "classmethod")
+
+
+class _NotLiteral(Exception):
+    pass
+
+
+@dataclass
+class HandlerManifest:
+    attr: str
+    decorator: str
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+
+
+@dataclass
+class ClassManifest:
+    name: str
+    handlers: List[HandlerManifest] = field(default_factory=list)
+
+
+def _evaluate(node: ast.AST, names: Dict[str, Any]) -> Any:
+    if isinstance(node, ast.Name):
+        if node.id in names:
+            return names[node.id]
+        if node.id in _BUILTINS:
+            return _BUILTINS[node.id]
+        raise _NotLiteral(node.id)
+    if isinstance(node, ast.Subscript):
+        value = _evaluate(node.value, names)
+        key = node.slice
+        if type(key).__name__ == "Index":
+            # Python < 3.9
+            key = key.value
+        key = _evaluate(key, names)
+        try:
+            return value[key]
+        except (KeyError, IndexError, TypeError):
+            raise _NotLiteral(ast.dump(node)) from None
+    if isinstance(node, (ast.Tuple, ast.List)):
+        items = [_evaluate(x, names) for x in node.elts]
+        return tuple(items) if isinstance(node, ast.Tuple) else items
+    if isinstance(node, ast.Dict):
+        if None in node.keys:
+            raise _NotLiteral("**")
+        return {
+            _evaluate(k, names): _evaluate(v, names)
+            for k, v in zip(node.keys, node.values)
+        }
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise _NotLiteral(ast.dump(node)) from None
+
+
+def _literals(body: List[ast.stmt], names: Dict[str, Any]) -> Dict[str, Any]:
+    """Literal assignments of a module / class body"""
+    names = dict(names)
+    for stmt in body:
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+            target, value = stmt.targets[0], stmt.value
+        elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+            target, value = stmt.target, stmt.value
+        else:
+            continue
+        if isinstance(target, ast.Name):
+            try:
+                names[target.id] = _evaluate(value, names)
+            except _NotLiteral:
+                names.pop(target.id, None)
+    return names
+
+
+def _is_module_base(node: ast.expr) -> bool:
+    """`Module` or `mod.Module`"""
+    return (
+        isinstance(node, ast.Attribute)
+        and node.attr == "Module"
+        and isinstance(node.value, ast.Name)
+    ) or (isinstance(node, ast.Name) and node.id == "Module")
+
+
+def _is_module_class(node: ast.ClassDef, classes: Dict[str, bool]) -> Optional[bool]:
+    """Whether a class is a plain `Module` subclass, `None` if it can't be told
+
+    Parameters:
+    ----------
+        - node (`ast.ClassDef`): Class.
+        - classes (`Dict[str, bool]`): Classes defined above it in the file, name -> plain `Module` subclass.
+    """
+    if node.keywords:
+        # metaclass=...
+        return None
+    is_module = False
+    for base in node.bases:
+        if _is_module_base(base):
+            is_module = True
+        elif not (
+            isinstance(base, ast.Name)
+            # A Module subclass of this file would hand down its handlers
+            and (
+                classes.get(base.id) is False
+                or isinstance(getattr(builtins, base.id, None), type)
+            )
+        ):
+            return None
+    return is_module
+
+
+def _handler_decorator(item: ast.AsyncFunctionDef) -> Union[ast.Call, bool, None]:
+    """The ``On*(...)`` decorator of a method, `False` if there's none and
+    `None` if some decorator can't be told apart from one
+    """
+    found: Union[ast.Call, bool] = False
+    for d in item.decorator_list:
+        if isinstance(d, ast.Name) and d.id in _PLAIN_DECORATORS:
+            continue
+        if not (
+            isinstance(d, ast.Call)
+            and isinstance(d.func, ast.Name)
+            and d.func.id.startswith("On")
+        ):
+            # e.g. `@decor.OnCmd(...)`, or a wrapper which may register one
+            return None
+        found = d
+    if found and len(item.decorator_list) > 1:
+        return None
+    return found
+
+
+def scan_manifest(path: Path) -> Optional[List[ClassManifest]]:
+    """Read the handlers of every `Module` class in a source file
+
+    Returns:
+    -------
+        `Optional[List[ClassManifest]]`: `None` if the module has to be imported to be registered.
+    """
+    try:
+        tree = ast.parse(path.read_text(), str(path))
+    except (OSError, SyntaxError, UnicodeDecodeError):
+        return None
+    module_names = _literals(tree.body, {})
+    manifests: List[ClassManifest] = []
+    classes: Dict[str, bool] = {}
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        is_module = classes[node.name] = _is_module_class(node, classes)
+        if is_module is None:
+            return None
+        if not is_module:
+            continue
+        names = _literals(node.body, module_names)
+        if names.get("disabled") is True:
+            continue
+        manifest = ClassManifest(node.name)
+        for item in node.body:
+            if not isinstance(item, ast.AsyncFunctionDef):
+                continue
+            call = _handler_decorator(item)
+            if call is None:
+                return None
+            if call is False:
+                continue
+            if call.func.id not in LAZY_DECORATORS:
+                return None
+            try:
+                args = tuple(_evaluate(a, names) for a in call.args)
+                kwargs = {kw.arg: _evaluate(kw.value, names) for kw in call.keywords}
+            except _NotLiteral:
+                return None
+            if None in kwargs:
+                return None
+            manifest.handlers.append(
+                HandlerManifest(item.name, call.func.id, args, kwargs)
+            )
+        manifests.append(manifest)
+    return manifests
+
+
+class LazyModule(mod.Module):
+    """Stand-in for a `Module` class which isn't imported yet
+
+    Its handlers are built from the `ClassManifest` with the same decorators,
+    on a trigger they load the real module and call the undecorated method.
+    """
+
+    module_name: str
+    class_name: str
+
+    def __init__(self, bot):
+        super().__init__(bot)
+        self.instance: Optional[mod.Module] = None
+        self._loading: Optional[asyncio.Future] = None
+        self.load_time = 0.0
+
+    @classmethod
+    def build(cls, module_name: str, manifest: ClassManifest) -> type:
+        attrs: Dict[str, Any] = dict(module_name=module_name, class_name=manifest.name)
+        for handler in manifest.handlers:
+            decorator = getattr(decor, handler.decorator)
+            attrs[handler.attr] = decorator(*handler.args, **handler.kwargs)(
+                cls._stub(handler.attr)
+            )
+        # Same class name, so logs and metrics don't tell them apart
+        return type(manifest.name, (cls,), attrs)
+
+    @staticmethod
+    def _stub(attr: str):
+        async def stub(self: "LazyModule", context):
+            instance = await self.resolve()
+            return await getattr(type(instance), attr).__wrapped__(instance, context)
+
+        stub.__name__ = stub.__qualname__ = attr
+        return stub
+
+    @property
+    def loaded(self) -> bool:
+        return self.instance is not None
+
+    async def resolve(self) -> mod.Module:
+        """Import the module and run its ``on_load`` (once)"""
+        if self.instance is not None:
+            return self.instance
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+        try:
+            return await asyncio.shield(self._loading)
+        except Exception:
+            # Try again on the next trigger
+            self._loading = None
+            raise
+
+    async def _load(self) -> mod.Module:
+        start = time.perf_counter()
+        module = await run_in_pool("io", importlib.import_module, self.module_name)
+        instance = getattr(module, self.class_name)(self.bot)
+        if inspect.iscoroutinefunction(getattr(instance, "on_load", None)):
+            await instance.on_load()
+        self.load_time = time.perf_counter() - start
+        MODULE_LOAD_SECONDS.set(self.class_name, value=self.load_time)
+        self.log.info(f"Loaded lazily in {self.load_time:.3f}s")
+        self.instance = instance
+        self.bot.plugins[self.class_name] = instance
+        self.bot.load_times[self.class_name] = self.load_time
+        return instance
@@ -1,6 +1,9 @@
 import asyncio
+import importlib
 import inspect
-from typing import Dict, List
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from pyrogram.handlers import (
     CallbackQueryHandler,
@@ -8,27 +11,79 @@ from pyrogram.handlers import (
     InlineQueryHandler,
     MessageHandler,
 )
+from pyrogram.handlers.handler import Handler
 
 from .. import mod, modules
+from ..config import CONFIG
+from ..utils import run_in_pool
+from .command_router import CommandRouter
+from .lazy import LazyModule, scan_manifest
+from .metrics import MODULE_LOAD_SECONDS, MODULES_LOADED
 
 
 class Loader:
     def __init__(self):
         self.plugins: Dict = {}
+        self.routers: Dict[int, CommandRouter] = {}
+        # Module class -> (handler or router, group, callback) it registered
+        self.handlers: Dict[str, List[Tuple[Handler, int, Callable]]] = {}
+        # Module class -> import + on_load seconds
+        self.load_times: Dict[str, float] = {}
+        self._module_warmer: Optional[asyncio.Task] = None
         super().__init__()
 
     async def load_modules(self) -> None:
-        for m in modules.submodules:
+        await self.import_modules()
+        await self.on_load_tasks()
+
+    async def import_modules(self) -> None:
+        """Import (or defer) every module and create its instance, without ``on_load``"""
+        for name in modules.names:
+            if (
+                CONFIG.lazy_modules
+                and (manifests := scan_manifest(modules.path(name))) is not None
+            ):
+                for manifest in manifests:
+                    self.plugins[manifest.name] = LazyModule.build(
+                        modules.qualname(name), manifest
+                    )(self)
+                continue
+            import_start = time.perf_counter()
+            # Off the loop, so that it overlaps with connecting the clients
+            m = await run_in_pool("io", modules.load, name)
+            import_time = time.perf_counter() - import_start
             for attr in dir(m):
                 if attr.startswith("__"):
                     continue
                 cls = getattr(m, attr, None)
-                await self.__load_classmod(cls)
-        await self.on_load_tasks()
+                if await self.__load_classmod(cls):
+                    self.load_times[cls.__name__] = import_time
 
-    async def __load_classmod(self, cls):
+    async def __load_classmod(self, cls) -> bool:
         if inspect.isclass(cls) and issubclass(cls, mod.Module) and not cls.disabled:
             self.plugins[cls.__name__] = cls(self)
+            return True
+        return False
+
+    async def warm_modules(self, delay: float = 0) -> None:
+        """Load the deferred modules one by one in the background"""
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        warmed: List[str] = []
+        for plugin in list(self.plugins.values()):
+            if not isinstance(plugin, LazyModule) or plugin.loaded:
+                continue
+            try:
+                await plugin.resolve()
+            except Exception as e:
+                self.log.error(f"Failed to load {plugin.class_name} - {e}")
+                continue
+            warmed.append(f"{plugin.class_name}: {plugin.load_time:.3f}s")
+        if warmed:
+            self.log.info(
+                f"Warmed up {len(warmed)} deferred modules in"
+                f" {time.perf_counter() - start:.3f}s ({', '.join(warmed)})"
+            )
 
     async def on_load_tasks(self) -> None:
         if self.plugins:
@@ -38,8 +93,25 @@ class Loader:
                     continue
 
                 if inspect.iscoroutinefunction(cls_mod.on_load):
-                    on_load_all.append(cls_mod.on_load())
+                    on_load_all.append(self.__timed_on_load(cls_mod))
             await asyncio.gather(*on_load_all)
+        MODULES_LOADED.set(value=len(self.plugins))
+        lazy = [k for k, v in self.plugins.items() if isinstance(v, LazyModule)]
+        self.log.info(
+            f"Loaded {len(self.plugins) - len(lazy)} modules"
+            f" ({', '.join(f'{k}: {v:.3f}s' for k, v in self.load_times.items())})"
+            + (f", deferred {len(lazy)} ({', '.join(lazy)})" if lazy else "")
+        )
+
+    async def __timed_on_load(self, cls_mod) -> None:
+        start = time.perf_counter()
+        try:
+            await cls_mod.on_load()
+        finally:
+            name = cls_mod.__class__.__name__
+            elapsed = time.perf_counter() - start
+            self.load_times[name] = self.load_times.get(name, 0) + elapsed
+            MODULE_LOAD_SECONDS.set(name, value=elapsed)
 
     async def on_exit_tasks(self) -> None:
         if self.plugins:
@@ -54,21 +126,135 @@ class Loader:
             await asyncio.gather(*on_exit_all)
 
     async def register_handlers(self) -> None:
-        for plugin in self.plugins.values():
-            for attr in dir(plugin):
-                if hasattr((func := getattr(plugin, attr)), "_handle"):
-                    self.log.debug(
-                        f"<Registering - {func._handle} hander - {func.__name__}>"
-                    )
-                    if func._handle == "message":
-                        handler = MessageHandler
-                    elif func._handle == "inline":
-                        handler = InlineQueryHandler
-                    elif func._handle == "callback":
-                        handler = CallbackQueryHandler
-                    elif func._handle == "delete":
-                        handler = DeletedMessagesHandler
-                    else:
-                        raise ValueError(f"[!] Invalid Handler type: {func._handle}")
-
-                    self.client.add_handler(handler(func, func._filters), func._group)
+        for name, plugin in self.plugins.items():
+            self.register_plugin(name, plugin)
+
+    def register_plugin(self, name: str, plugin: mod.Module) -> None:
+        registered = self.handlers.setdefault(name, [])
+        # Username is set once the bot client is up
+        username = getattr(getattr(self, "bot_info", None), "username", None)
+        for attr in dir(plugin):
+            if hasattr((func := getattr(plugin, attr)), "_handle"):
+                self.log.debug(
+                    f"<Registering - {func._handle} hander - {func.__name__}>"
+                )
+                if func._handle == "command":
+                    if (router := self.routers.get(func._group)) is None:
+                        router = self.routers[func._group] = CommandRouter(username)
+                        self.client.add_handler(router, func._group)
+                    router.add(func, func._command, func._filters)
+                    registered.append((router, func._group, func))
+                    continue
+                elif func._handle == "message":
+                    handler = MessageHandler
+                elif func._handle == "inline":
+                    handler = InlineQueryHandler
+                elif func._handle == "callback":
+                    handler = CallbackQueryHandler
+                elif func._handle == "delete":
+                    handler = DeletedMessagesHandler
+                else:
+                    raise ValueError(f"[!] Invalid Handler type: {func._handle}")
+
+                handler = handler(func, func._filters)
+                self.client.add_handler(handler, func._group)
+                registered.append((handler, func._group, func))
+
+    def unregister_plugin(self, name: str) -> int:
+        """Remove exactly the handlers registered for a module class"""
+        registered = self.handlers.pop(name, [])
+        for handler, group, func in registered:
+            if isinstance(handler, CommandRouter):
+                handler.remove(func)
+            else:
+                self.client.remove_handler(handler, group)
+        return len(registered)
+
+    @staticmethod
+    def _source(plugin: mod.Module) -> str:
+        if isinstance(plugin, LazyModule):
+            return plugin.module_name
+        return type(plugin).__module__
+
+    async def reload_module(self, name: str) -> Dict[str, Any]:
+        """Re-import one module file and swap its handlers, everything else stays live
+
+        Parameters:
+        ----------
+            - name (`str`): Module file (e.g. `"term"`) or class (e.g. `"Term"`) name.
+
+        Raises:
+        ------
+            `ValueError`: If there is no such module.
+
+        Returns:
+        -------
+            `Dict[str, Any]`: module, classes, handlers (removed, added) and timings in seconds
+        """
+        if (plugin := self.plugins.get(name)) is not None:
+            qualname = self._source(plugin)
+            name = qualname.rpartition(".")[2]
+        elif modules.path(name).is_file():
+            qualname = modules.qualname(name)
+        else:
+            raise ValueError(f"No module named '{name}'")
+        start = time.perf_counter()
+        old = {k: v for k, v in self.plugins.items() if self._source(v) == qualname}
+        # Import first, the old handlers keep working if it fails
+        if (module := sys.modules.get(qualname)) is not None:
+            module = await run_in_pool("io", importlib.reload, module)
+        else:
+            module = await run_in_pool("io", modules.load, name)
+        import_time = time.perf_counter() - start
+
+        exit_start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                plugin.on_exit()
+                for plugin in old.values()
+                if inspect.iscoroutinefunction(getattr(plugin, "on_exit", None))
+            )
+        )
+        removed = 0
+        for cls_name in old:
+            removed += self.unregister_plugin(cls_name)
+            del self.plugins[cls_name]
+            self.load_times.pop(cls_name, None)
+        exit_time = time.perf_counter() - exit_start
+
+        load_start = time.perf_counter()
+        new: Dict[str, mod.Module] = {}
+        for attr in dir(module):
+            cls = getattr(module, attr, None)
+            if (
+                inspect.isclass(cls)
+                and cls.__module__ == qualname
+                and await self.__load_classmod(cls)
+            ):
+                new[cls.__name__] = self.plugins[cls.__name__]
+                self.load_times[cls.__name__] = import_time
+        await asyncio.gather(
+            *(
+                self.__timed_on_load(plugin)
+                for plugin in new.values()
+                if inspect.iscoroutinefunction(getattr(plugin, "on_load", None))
+            )
+        )
+        for cls_name, plugin in new.items():
+            self.register_plugin(cls_name, plugin)
+        MODULES_LOADED.set(value=len(self.plugins))
+        report = dict(
+            module=name,
+            classes=list(new),
+            removed=removed,
+            added=sum(len(self.handlers.get(k, ())) for k in new),
+            import_time=import_time,
+            exit_time=exit_time,
+            load_time=time.perf_counter() - load_start,
+            total=time.perf_counter() - start,
+        )
+        self.log.info(
+            f"Reloaded '{name}' ({', '.join(new) or 'no classes'}) in {report['total']:.3f}s"
+            f" - handlers: -{removed} +{report['added']}"
+        )
+        return report
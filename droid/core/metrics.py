@@ -0,0 +1,208 @@
+__all__ = ["Counter", "Gauge", "Histogram", "Registry", "METRICS", "export_stats"]
+
+"""
+Minimal metrics registry
+
+~ Prometheus text exposition format over an optional local aiohttp server
+"""
+import bisect
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+LOG = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{n}{l} {v:g}" for n, l, v in self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = ()) -> None:
+        super().__init__(name, doc, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _labels(self.label_names, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labels: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, doc, labels)
+        self.buckets = buckets
+        # labels -> [per bucket counts..., +Inf count], sum
+        self.values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        if (entry := self.values.get(labels)) is None:
+            entry = self.values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def samples(self):
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    _labels(self.label_names, labels, f'le="{bound}"'),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", _labels(self.label_names, labels), total[0]
+            yield f"{self.name}_count", _labels(self.label_names, labels), cumulative
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, _Metric] = {}
+        # Called before rendering, to update gauges from other stats
+        self.collectors: List[Callable[[], None]] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    def _add(self, metric: _Metric) -> _Metric:
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, doc: str, labels: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, doc, labels))
+
+    def gauge(self, name: str, doc: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._add(Gauge(name, doc, labels))
+
+    def histogram(
+        self,
+        name: str,
+        doc: str,
+        labels: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._add(Histogram(name, doc, labels, buckets))
+
+    def collector(self, func: Callable[[], None]) -> Callable[[], None]:
+        self.collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        for func in self.collectors:
+            try:
+                func()
+            except Exception as e:
+                LOG.error(f"Metrics collector failed - {e}")
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, _: web.Request) -> web.Response:
+        return web.Response(
+            text=self.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    async def start_server(self, host: str, port: int) -> None:
+        """Serve ``/metrics`` on ``host:port``"""
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        LOG.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    async def stop_server(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+METRICS = Registry()
+
+HANDLER_LATENCY = METRICS.histogram(
+    "droid_handler_seconds", "Handler run time", ("module", "handler")
+)
+HANDLER_ERRORS = METRICS.counter(
+    "droid_handler_errors_total", "Handler exceptions", ("module", "handler")
+)
+HANDLERS_INFLIGHT = METRICS.gauge(
+    "droid_handlers_inflight", "Updates currently being handled"
+)
+RPC_TOTAL = METRICS.counter("droid_rpc_total", "Telegram RPCs sent", ("method",))
+FLOOD_WAITS = METRICS.counter(
+    "droid_flood_waits_total", "FloodWait / SlowmodeWait errors", ("method",)
+)
+FLOOD_SLEEP = METRICS.counter(
+    "droid_flood_sleep_seconds_total", "Seconds slept on FloodWait / SlowmodeWait"
+)
+HTTP_LATENCY = METRICS.histogram(
+    "droid_http_request_seconds", "Http.get_json request time", ("host", "status")
+)
+CONVERSATIONS = METRICS.gauge("droid_conversations_active", "Active conversations")
+CONVERSATION_TIMEOUTS = METRICS.counter(
+    "droid_conversation_timeouts_total", "Conversation listen timeouts"
+)
+MODULES_LOADED = METRICS.gauge("droid_modules_loaded", "Loaded modules")
+MODULE_LOAD_SECONDS = METRICS.gauge(
+    "droid_module_load_seconds", "Module on_load time", ("module",)
+)
+COMPONENT_STATS = METRICS.gauge(
+    "droid_component_stat",
+    "Counters of caches, limiters and queues (e.g. hits / misses)",
+    ("component", "stat"),
+)
+
+
+def export_stats(component: str, stats: Dict[str, float]) -> None:
+    """Copy a component's ``stats`` dict into `COMPONENT_STATS`"""
+    for stat, value in stats.items():
+        if isinstance(value, (int, float)):
+            COMPONENT_STATS.set(component, stat, value=value)
@@ -0,0 +1,109 @@
+__all__ = ["HandlerStats", "LatencyHistogram", "PERF"]
+
+"""
+Per-handler latency statistics
+
+~ Log-scale histogram: fixed memory, percentiles within ~5% of the true value
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+# 10µs .. ~17min in 5% steps (~380 buckets)
+_MIN_LATENCY = 1e-5
+_GROWTH = 1.05
+_LOG_GROWTH = math.log(_GROWTH)
+_BUCKETS = int(math.log(1e3 / _MIN_LATENCY) / _LOG_GROWTH) + 1
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * (_BUCKETS + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        if seconds <= _MIN_LATENCY:
+            index = 0
+        else:
+            index = min(
+                int(math.log(seconds / _MIN_LATENCY) / _LOG_GROWTH) + 1, _BUCKETS
+            )
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` (0 - 100) percentile"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * q / 100) or 1
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_MIN_LATENCY * _GROWTH**index, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class HandlerStats:
+    """Call count, errors and latency histogram of every handler"""
+
+    def __init__(self) -> None:
+        self.handlers: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+
+    def observe(self, module: str, handler: str, seconds: float, error: bool) -> None:
+        key = (module, handler)
+        if (hist := self.handlers.get(key)) is None:
+            hist = self.handlers[key] = LatencyHistogram()
+        hist.observe(seconds)
+        if error:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def reset(self) -> None:
+        self.handlers.clear()
+        self.errors.clear()
+
+    def top(self, n: int = 10, by: int = 95) -> List[Dict]:
+        """Handlers sorted by the ``by`` percentile, slowest first
+
+        Parameters:
+        ----------
+            - n (`int`, optional): Max. handlers. (Defaults to `10`)
+            - by (`int`, optional): Percentile to sort on. (Defaults to `95`)
+
+        Returns:
+        -------
+            `List[Dict]`: name, count, errors, mean, p50, p95, p99 and max (in seconds)
+        """
+        rows = [
+            dict(
+                name=f"{module}.{handler}",
+                count=hist.count,
+                errors=self.errors.get((module, handler), 0),
+                mean=hist.mean,
+                p50=hist.percentile(50),
+                p95=hist.percentile(95),
+                p99=hist.percentile(99),
+                max=hist.max,
+                _sort=hist.percentile(by),
+            )
+            for (module, handler), hist in self.handlers.items()
+        ]
+        rows.sort(key=lambda x: x.pop("_sort"), reverse=True)
+        return rows[:n]
+
+    def get(self, module: str, handler: str) -> Optional[LatencyHistogram]:
+        return self.handlers.get((module, handler))
+
+
+PERF = HandlerStats()
@@ -5,10 +5,16 @@ from abc import ABC, abstractmethod
 from typing import Optional
 
 from pyrogram import Client
+from pyrogram.handlers import ChatMemberUpdatedHandler
 from pyrogram.types import User
 
 from ..config import CONFIG
+from ..utils import POOLS
+from .admin_cache import ADMIN_CACHE
 from .clientmod import Droid
+from .metrics import METRICS, export_stats
+from .scheduler import SCHEDULER
+from .startup import StartupReport
 
 
 class PyroBot(ABC):
@@ -19,29 +25,91 @@ class PyroBot(ABC):
     userbot: Optional[Client] = None
     user_info: Optional[User] = None
     _is_running: bool
+    _admin_warmer: Optional[asyncio.Task] = None
+    startup: Optional[StartupReport] = None
+    _stop_event: Optional[asyncio.Event] = None
 
     def __init__(self):
         super().__init__()
 
     async def init_bot(self):
+        report = self.startup = StartupReport()
         client_config = CONFIG._client.copy()
         if string_session := client_config.pop("string_session", None):
             self.userbot = Droid(session_name=string_session, **client_config)
         self.client = Droid(session_name="droid", **client_config)
-        await self._init_client(start=True)
-        self.log.info("Pyrogram client stated.")
-        self.log.info("Loading modules...")
-        await self.load_modules()
-        await self.register_handlers()
-
-    async def _init_client(self, start: bool = True):
-        if start:
-            await self.client.start()
-        self.bot_info = await self.client.get_me()
-        if self.userbot:
-            if start:
-                await self.userbot.start()
-            self.user_info = await self.userbot.get_me()
+
+        async def clients():
+            self.log.info("Starting pyrogram clients...")
+            bot_info, user_info = await asyncio.gather(
+                report.run("bot_client", self._start_client(self.client)),
+                (
+                    report.run("userbot_client", self._start_client(self.userbot))
+                    if self.userbot
+                    else asyncio.sleep(0)
+                ),
+            )
+            self.bot_info, self.user_info = bot_info, user_info
+            for router in self.routers.values():
+                router.username = bot_info.username.lower()
+            self.log.info("Pyrogram client stated.")
+
+        async def modules():
+            self.log.info("Loading modules...")
+            await report.run("import_modules", self.import_modules())
+
+        await asyncio.gather(clients(), modules())
+        # on_load may use the clients
+        await report.run(
+            "on_load", self.on_load_tasks(), after=("import_modules", "bot_client")
+        )
+        # Not before on_load, handlers rely on the state it sets up
+        await report.run(
+            "register_handlers", self.register_handlers(), after=("on_load",)
+        )
+        self.client.add_handler(
+            ChatMemberUpdatedHandler(ADMIN_CACHE.on_member_updated), group=-1
+        )
+        report.finish()
+        self.log.info(f"Startup report:\n{report.render()}")
+        self._admin_warmer = asyncio.create_task(
+            ADMIN_CACHE.warm(
+                self.client, CONFIG.admin_warm_chats, rate=CONFIG.admin_warm_rate
+            )
+        )
+        if CONFIG.module_warmup >= 0:
+            self._module_warmer = asyncio.create_task(
+                self.warm_modules(CONFIG.module_warmup)
+            )
+        if CONFIG.metrics_port:
+            METRICS.collector(self._collect_stats)
+            await METRICS.start_server(CONFIG.metrics_host, CONFIG.metrics_port)
+
+    def _collect_stats(self) -> None:
+        export_stats("admin_cache", ADMIN_CACHE.stats)
+        export_stats("http", self.http_stats)
+        export_stats("http_cache", self.http_cache.stats)
+        export_stats("scheduler", SCHEDULER.stats)
+        for name, pool in POOLS.items():
+            export_stats(f"pool_{name}", pool.stats)
+        for name, client in (("bot", self.client), ("user", self.userbot)):
+            if client is not None:
+                export_stats(
+                    f"{name}_updates",
+                    dict(queued=client.dispatcher.updates_queue.qsize()),
+                )
+                export_stats(f"{name}_limiter", client.limiter.stats)
+                export_stats(f"{name}_edits", client.edits.stats)
+
+    @staticmethod
+    async def _start_client(client: Client) -> User:
+        await client.start()
+        return await client.get_me()
+
+    def request_stop(self) -> None:
+        self._is_running = False
+        if self._stop_event is not None:
+            self._stop_event.set()
 
     async def idle(self) -> None:
         signals = {
@@ -49,22 +117,27 @@ class PyroBot(ABC):
             for v, k in signal.__dict__.items()
             if v.startswith("SIG") and not v.startswith("SIG_")
         }
+        loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
 
-        def signal_handler(signum, __):
-
+        def signal_handler(signum, *_):
             self.log.info(f"Stop signal received ('{signals[signum]}').")
-            self._is_running = False
+            self.request_stop()
 
         _SIGNALS = [signal.SIGTERM, signal.SIGINT, signal.SIGABRT]
         if sys.platform == "win32":
             _SIGNALS.append(signal.SIGBREAK)
         for name in _SIGNALS:
-            signal.signal(name, signal_handler)
+            try:
+                loop.add_signal_handler(name, signal_handler, name)
+            except NotImplementedError:
+                # Windows event loops
+                signal.signal(
+                    name, lambda *x: loop.call_soon_threadsafe(signal_handler, *x)
+                )
 
         self._is_running = True
-
-        while self._is_running:
-            await asyncio.sleep(1)
+        await self._stop_event.wait()
 
     @abstractmethod
     async def stop(self) -> None:
@@ -0,0 +1,180 @@
+__all__ = ["RateLimiter", "TokenBucket"]
+
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+from pyrogram.raw import functions, types
+from pyrogram.raw.core import TLObject
+
+# RPCs which deliver something to a chat, everything else (reads) bypasses the limiter
+WRITE_RPCS = (
+    functions.messages.SendMessage,
+    functions.messages.SendMedia,
+    functions.messages.SendMultiMedia,
+    functions.messages.SendInlineBotResult,
+    functions.messages.ForwardMessages,
+    functions.messages.EditMessage,
+)
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` tokens/sec, up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.base_rate = self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_flood = 0.0
+        self.waiting = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def idle(self) -> bool:
+        """Nothing would be lost by dropping the bucket: no waiters, full, and
+        neither blocked nor slowed down by a recent FloodWait"""
+        now = time.monotonic()
+        self._refill(now)
+        return (
+            not self.waiting
+            and self.tokens >= self.capacity
+            and now >= self.blocked_until
+            and self.rate >= self.base_rate
+        )
+
+    def _refill(self, now: float) -> None:
+        # Recover the configured rate a minute after the last FloodWait
+        if self.rate < self.base_rate and now - self.last_flood > 60:
+            self.rate = self.base_rate
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Wait for a token (FIFO)
+
+        Returns:
+        -------
+            `float`: Seconds waited
+        """
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now >= self.blocked_until and self.tokens >= 1:
+                        self.tokens -= 1
+                        return now - start
+                    await asyncio.sleep(
+                        max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+                    )
+        finally:
+            self.waiting -= 1
+
+    def penalize(self, seconds: float) -> None:
+        """Block the bucket for ``seconds`` and halve its rate after a FloodWait"""
+        now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.rate = max(self.rate / 2, self.base_rate / 8)
+        self.tokens = 0
+        self.last_flood = now
+
+
+class RateLimiter:
+    """Per-chat, per-group and global outbound rate limits
+
+    Parameters:
+    ----------
+        - global_rate (`float`): Messages/sec across all chats.
+        - chat_rate (`float`): Messages/sec in a private chat.
+        - group_rate (`float`): Messages/sec in a group or channel.
+        - burst (`float`, optional): Messages a chat may send at once. (Defaults to `3`)
+        - max_chats (`int`, optional): Idle chat buckets are dropped above this. (Defaults to `2048`)
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        chat_rate: float,
+        group_rate: float,
+        burst: float = 3,
+        max_chats: int = 2048,
+    ) -> None:
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self.max_chats = max_chats
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.buckets: Dict[Tuple[str, int], TokenBucket] = {}
+        self.sent = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.floods = 0
+
+    @staticmethod
+    def peer_key(data: TLObject) -> Optional[Tuple[str, int]]:
+        """("user" | "chat" | "channel", id) of the chat a write RPC targets"""
+        if not isinstance(data, WRITE_RPCS):
+            return None
+        peer = getattr(data, "peer", None) or getattr(data, "to_peer", None)
+        if isinstance(peer, types.InputPeerUser):
+            return "user", peer.user_id
+        if isinstance(peer, types.InputPeerChat):
+            return "chat", peer.chat_id
+        if isinstance(peer, types.InputPeerChannel):
+            return "channel", peer.channel_id
+        if isinstance(peer, types.InputPeerSelf):
+            return "user", 0
+        return None
+
+    def bucket(self, key: Tuple[str, int]) -> TokenBucket:
+        if (bucket := self.buckets.get(key)) is None:
+            if len(self.buckets) >= self.max_chats:
+                for k in [k for k, b in self.buckets.items() if b.idle]:
+                    del self.buckets[k]
+            rate = self.chat_rate if key[0] == "user" else self.group_rate
+            bucket = self.buckets[key] = TokenBucket(rate, capacity=self.burst)
+        return bucket
+
+    async def acquire(self, data: TLObject) -> Optional[Tuple[str, int]]:
+        """Wait until ``data`` may be sent, returns the peer key (``None`` if unlimited)"""
+        if (key := self.peer_key(data)) is None:
+            return None
+        waited = await self.bucket(key).acquire()
+        waited += await self.global_bucket.acquire()
+        self.sent += 1
+        if waited > 1e-3:
+            self.waits += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+        return key
+
+    def flood(self, key: Optional[Tuple[str, int]], seconds: float) -> None:
+        """Feed a FloodWait/SlowmodeWait back into the buckets"""
+        self.floods += 1
+        # FloodWaits of read RPCs are per method, they don't affect sending
+        if key is not None:
+            self.bucket(key).penalize(seconds)
+
+    @property
+    def queued(self) -> int:
+        return self.global_bucket.waiting + sum(
+            b.waiting for b in self.buckets.values()
+        )
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return dict(
+            queued=self.queued,
+            chats=len(self.buckets),
+            sent=self.sent,
+            waits=self.waits,
+            wait_time=round(self.wait_time, 3),
+            avg_wait=round(self.wait_time / self.waits, 3) if self.waits else 0.0,
+            max_wait=round(self.max_wait, 3),
+            floods=self.floods,
+        )
@@ -0,0 +1,340 @@
+__all__ = [
+    "PRIORITIES",
+    "SCHEDULER",
+    "Scheduler",
+    "dedup_key",
+    "delete_in",
+    "lane_key",
+]
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from pyrogram import ContinuePropagation, StopPropagation
+from pyrogram.types import CallbackQuery, InlineQuery, Message, Update
+
+from ..config import CONFIG
+from .metrics import METRICS
+
+LOG = logging.getLogger(__name__)
+
+# Highest first, "session" (conversations) runs on its own
+PRIORITIES = ("moderation", "interactive", "bulk", "session")
+
+QUEUE_WAIT = METRICS.histogram(
+    "droid_queue_wait_seconds", "Time a handler job waited to start", ("priority",)
+)
+SHED = METRICS.counter(
+    "droid_shed_total", "Handler jobs dropped under load", ("priority", "reason")
+)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+def lane_key(update: Update) -> Optional[Hashable]:
+    """Chat an update belongs to (user for inline queries / inline messages)"""
+    if isinstance(update, Message):
+        if update.chat:
+            return update.chat.id
+    elif isinstance(update, CallbackQuery):
+        if update.message and update.message.chat:
+            return update.message.chat.id
+        if update.from_user:
+            return update.from_user.id
+    elif isinstance(update, InlineQuery):
+        return update.from_user.id
+    return None
+
+
+def dedup_key(update: Update) -> Optional[Hashable]:
+    """Updates which replace each other while queued
+
+    ~ callback: the same button pressed again on the same message (the new one is dropped)
+    ~ inline: any newer query of the same user (the old one is dropped)
+    """
+    if isinstance(update, CallbackQuery):
+        return (
+            "callback",
+            update.from_user.id,
+            update.message.message_id if update.message else update.inline_message_id,
+            update.data,
+        )
+    if isinstance(update, InlineQuery):
+        return "inline", update.from_user.id
+    return None
+
+
+class _Entry:
+    __slots__ = ("job", "priority", "dedup", "enqueued", "dropped")
+
+    def __init__(self, job: Job, priority: str, dedup: Optional[Hashable]) -> None:
+        self.job = job
+        self.priority = priority
+        self.dedup = dedup
+        self.enqueued = time.monotonic()
+        self.dropped = False
+
+
+class _Lane:
+    __slots__ = ("queues", "task")
+
+    def __init__(self) -> None:
+        # moderation, interactive
+        self.queues: List[Deque[_Entry]] = [deque(), deque()]
+        self.task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        # Moderation jobs have a limit of their own
+        return len(self.queues[1])
+
+    def next(self) -> Optional[_Entry]:
+        for queue in self.queues:
+            if queue:
+                return queue.popleft()
+        return None
+
+
+class Scheduler:
+    """Runs handler jobs off the dispatcher workers
+
+    ~ moderation / interactive: one lane per chat, in order (moderation jumps
+      the queue), different chats run in parallel.
+    ~ bulk: long jobs, run by a bounded pool of ``bulk_workers`` tasks, so they
+      never hold up a chat's lane. Shed once ``bulk_queue`` of them are waiting.
+    ~ session: conversations, mostly idle while waiting for replies, in a task
+      of their own so they hold neither a lane nor a bulk worker (there's at
+      most one conversation per chat and user).
+
+    Queued jobs are bounded (``max_pending`` in total, ``lane_limit`` per chat)
+    and interactive ones are skipped once older than ``max_age``
+    (``inline_max_age`` for inline queries). Moderation jobs only count against
+    a limit of their own, ``lane_limit`` per chat.
+
+    A job holds its lane until it returns, so anything it waits for without
+    working (e.g. deleting a reply later) goes to `detach`.
+    """
+
+    def __init__(
+        self,
+        bulk_workers: int = 4,
+        bulk_queue: int = 64,
+        max_pending: int = 1000,
+        lane_limit: int = 50,
+        max_age: float = 30,
+        inline_max_age: float = 5,
+    ) -> None:
+        self.lanes: Dict[Hashable, _Lane] = {}
+        self.bulk_workers = max(bulk_workers, 1)
+        self.bulk_queue = bulk_queue
+        self.max_pending = max_pending
+        self.lane_limit = lane_limit
+        self.max_age = max_age
+        self.inline_max_age = inline_max_age
+        self._bulk: Optional["asyncio.Queue[_Entry]"] = None
+        self._workers: List[asyncio.Task] = []
+        self._loose: set = set()
+        # dedup key -> queued entry
+        self._queued: Dict[Hashable, _Entry] = {}
+        self.pending = 0
+        self.submitted = dict.fromkeys(PRIORITIES, 0)
+        self.shed: Dict[str, int] = {}
+        self.max_lanes = 0
+
+    def _shed(self, entry: _Entry, reason: str) -> None:
+        entry.dropped = True
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        SHED.inc(entry.priority, reason)
+
+    def _admit(self, entry: _Entry, lane: Optional[_Lane]) -> bool:
+        if entry.priority == "moderation":
+            # Not shed under load, but a raid can't queue up without a bound
+            if lane is not None and len(lane.queues[0]) >= self.lane_limit:
+                self._shed(entry, "moderation_full")
+                return False
+            return True
+        if entry.dedup is not None and (old := self._queued.get(entry.dedup)):
+            if entry.dedup[0] != "inline":
+                self._shed(entry, "duplicate")
+                return False
+            self._shed(old, "superseded")
+        if self.pending >= self.max_pending:
+            self._shed(entry, "overload")
+            return False
+        if lane is not None and len(lane) >= self.lane_limit:
+            self._shed(entry, "lane_full")
+            return False
+        return True
+
+    async def submit(
+        self,
+        key: Optional[Hashable],
+        priority: str,
+        job: Job,
+        dedup: Optional[Hashable] = None,
+    ) -> bool:
+        """Queue ``job``, never waits
+
+        Returns:
+        -------
+            `bool`: `False` if the job was shed
+        """
+        self.submitted[priority] += 1
+        entry = _Entry(job, priority, dedup)
+        if priority == "bulk":
+            if not self._admit(entry, None):
+                return False
+            try:
+                # Waiting here would hold up pyrogram's dispatcher
+                self._bulk_pool().put_nowait(entry)
+            except asyncio.QueueFull:
+                self._shed(entry, "bulk_full")
+                return False
+            self._track(entry)
+            return True
+        lane = (
+            self.lanes.get(key) if key is not None and priority != "session" else None
+        )
+        if not self._admit(entry, lane):
+            return False
+        self._track(entry)
+        if key is None or priority == "session":
+            # No chat to keep in order
+            task = asyncio.create_task(self._run(entry))
+            self._loose.add(task)
+            task.add_done_callback(self._loose.discard)
+            return True
+        if lane is None:
+            lane = self.lanes[key] = _Lane()
+            self.max_lanes = max(self.max_lanes, len(self.lanes))
+        lane.queues[PRIORITIES.index(priority)].append(entry)
+        if lane.task is None:
+            lane.task = asyncio.create_task(self._run_lane(key, lane))
+        return True
+
+    def _track(self, entry: _Entry) -> None:
+        self.pending += 1
+        if entry.dedup is not None:
+            self._queued[entry.dedup] = entry
+
+    async def _run_lane(self, key: Hashable, lane: _Lane) -> None:
+        try:
+            while (entry := lane.next()) is not None:
+                await self._run(entry)
+        finally:
+            if self.lanes.get(key) is lane:
+                del self.lanes[key]
+
+    def _bulk_pool(self) -> "asyncio.Queue[_Entry]":
+        if self._bulk is None:
+            self._bulk = asyncio.Queue(self.bulk_queue)
+            self._workers = [
+                asyncio.create_task(self._bulk_worker())
+                for _ in range(self.bulk_workers)
+            ]
+        return self._bulk
+
+    async def _bulk_worker(self) -> None:
+        while True:
+            entry = await self._bulk.get()
+            try:
+                await self._run(entry)
+            finally:
+                self._bulk.task_done()
+
+    async def _run(self, entry: _Entry) -> None:
+        self.pending -= 1
+        if entry.dedup is not None and self._queued.get(entry.dedup) is entry:
+            del self._queued[entry.dedup]
+        if entry.dropped:
+            return
+        age = time.monotonic() - entry.enqueued
+        QUEUE_WAIT.observe(entry.priority, value=age)
+        if entry.priority == "interactive" and age > (
+            self.inline_max_age
+            if entry.dedup is not None and entry.dedup[0] == "inline"
+            else self.max_age
+        ):
+            self._shed(entry, "stale")
+            return
+        try:
+            await entry.job()
+        except StopPropagation:
+            LOG.warning(
+                "StopPropagation raised by a scheduled job has no effect, "
+                "dispatch has already moved on (use propagate=False)"
+            )
+        except ContinuePropagation:
+            pass
+        except Exception as e:
+            LOG.exception(f"Scheduled job failed - {e}")
+
+    def detach(self, coro: Awaitable[Any]) -> "asyncio.Task[Any]":
+        """Run ``coro`` in a task of its own, outside of any lane (cancelled by `stop`)"""
+        task = asyncio.ensure_future(coro)
+        self._loose.add(task)
+        task.add_done_callback(self._detached)
+        return task
+
+    def _detached(self, task: "asyncio.Task[Any]") -> None:
+        self._loose.discard(task)
+        if not task.cancelled() and (e := task.exception()) is not None:
+            LOG.error(f"Detached job failed - {e}", exc_info=e)
+
+    async def stop(self) -> None:
+        tasks = [
+            *self._workers,
+            *self._loose,
+            *(lane.task for lane in self.lanes.values() if lane.task),
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.lanes.clear()
+        self._workers.clear()
+        self._queued.clear()
+        self._bulk = None
+        self.pending = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            pending=self.pending,
+            lanes=len(self.lanes),
+            max_lanes=self.max_lanes,
+            bulk_queued=self._bulk.qsize() if self._bulk else 0,
+            **{f"submitted_{k}": v for k, v in self.submitted.items()},
+            **{f"shed_{k}": v for k, v in self.shed.items()},
+        )
+
+
+async def _delete(delay: float, messages: Tuple[Message, ...]) -> None:
+    await asyncio.sleep(delay)
+    await asyncio.gather(*(m.delete() for m in messages))
+
+
+def delete_in(delay: float, *messages: Message) -> "asyncio.Task[None]":
+    """Delete ``messages`` after ``delay`` seconds, without holding up the caller's lane"""
+    return SCHEDULER.detach(_delete(delay, messages))
+
+
+SCHEDULER = Scheduler(
+    CONFIG.bulk_workers,
+    CONFIG.bulk_queue_size,
+    max_pending=CONFIG.ingress_max_pending,
+    lane_limit=CONFIG.ingress_lane_limit,
+    max_age=CONFIG.ingress_max_age,
+    inline_max_age=CONFIG.ingress_inline_max_age,
+)
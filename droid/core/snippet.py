@@ -0,0 +1,267 @@
+__all__ = [
+    "SnippetResult",
+    "SnippetTimeout",
+    "run_in_thread",
+    "run_isolated",
+]
+
+"""
+Running code snippets away from the event loop
+
+~ `run_in_thread`: in a thread of its own, at the deadline the snippet gets a
+  `SnippetTimeout` raised inside it (only while running Python code).
+~ `run_isolated`: in a fresh interpreter (this file as a script), killed at
+  the deadline.
+"""
+import asyncio
+import ctypes
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+# How long a timed out thread gets to unwind
+_UNWIND_TIMEOUT = 1
+# Bytes of output kept from an isolated snippet, the rest is read and dropped
+_OUTPUT_LIMIT = 1 << 20
+
+
+class SnippetTimeout(BaseException):
+    """Raised inside a snippet thread at its deadline
+
+    Not an `Exception`, so a bare ``except Exception`` in the snippet doesn't
+    swallow it.
+    """
+
+
+@dataclass
+class SnippetResult:
+    out: str = ""
+    # repr() of the returned value
+    result: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    # Bytes
+    peak_memory: int = 0
+    timed_out: bool = False
+
+
+def _interrupt(thread: threading.Thread) -> bool:
+    """Raise `SnippetTimeout` in ``thread`` (CPython only)"""
+    try:
+        return (
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(thread.ident), ctypes.py_object(SnippetTimeout)
+            )
+            == 1
+        )
+    except AttributeError:
+        return False
+
+
+async def run_in_thread(func: Callable[[], Any], timeout: float = 0) -> Any:
+    """Call ``func`` in a new daemon thread
+
+    A thread of its own rather than a pool worker, so that interrupting it
+    can't hit an unrelated job.
+
+    Parameters:
+    ----------
+        - func (`Callable[[], Any]`): Blocking function.
+        - timeout (`float`, optional): Deadline in seconds, 0 for none. (Defaults to `0`)
+
+    Raises:
+    ------
+        `asyncio.TimeoutError`: If ``func`` didn't return in time, the thread
+        may still be running if it's blocked outside of Python code.
+
+    Returns:
+    -------
+        `Any`: Return value of ``func``
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result: Any, error: Optional[BaseException]) -> None:
+        if future.done():
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def target() -> None:
+        try:
+            result = func()
+        except BaseException as e:  # skipcq: PYL-W0703
+            loop.call_soon_threadsafe(resolve, None, e)
+        else:
+            loop.call_soon_threadsafe(resolve, result, None)
+
+    thread = threading.Thread(target=target, name="droid-snippet", daemon=True)
+    thread.start()
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout or None)
+    except asyncio.TimeoutError:
+        if _interrupt(thread):
+            await asyncio.wait([future], timeout=_UNWIND_TIMEOUT)
+        if future.done() and not future.cancelled():
+            # Retrieved, so it isn't logged as never retrieved
+            future.exception()
+        raise
+
+
+async def run_isolated(code: str, timeout: float = 0) -> SnippetResult:
+    """Run ``code`` (async code allowed) in a new Python process
+
+    The snippet shares nothing with the bot, its stdout and stderr are the
+    output, which is kept up to the deadline (and its first MiB).
+
+    Parameters:
+    ----------
+        - code (`str`): Snippet.
+        - timeout (`float`, optional): Deadline in seconds, 0 for none. (Defaults to `0`)
+
+    Returns:
+    -------
+        `SnippetResult`: peak_memory is the max. RSS of the process.
+    """
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable,
+        # Not picking up the modules next to this file
+        "-I",
+        os.path.abspath(__file__),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=os.name == "posix",
+    )
+    result = SnippetResult()
+    reads = asyncio.ensure_future(
+        asyncio.gather(
+            _read_capped(proc.stdout, _OUTPUT_LIMIT),
+            # The report is the last line
+            _read_capped(proc.stderr, _OUTPUT_LIMIT, tail=True),
+        )
+    )
+    try:
+        proc.stdin.write(code.encode())
+        await proc.stdin.drain()
+        proc.stdin.close()
+        try:
+            (out, dropped), (report, _) = await asyncio.wait_for(
+                asyncio.shield(reads), timeout or None
+            )
+        except asyncio.TimeoutError:
+            result.timed_out = True
+            _kill(proc)
+            (out, dropped), (report, _) = await reads
+        await proc.wait()
+    finally:
+        # Cancelled or failed to write
+        _kill(proc)
+    result.out = out.decode("utf-8", "replace")
+    if dropped:
+        result.out += f"\n[output limit reached, {dropped} more bytes dropped]\n"
+    result.elapsed = time.perf_counter() - start
+    try:
+        report = json.loads(report.decode().strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        if not result.timed_out:
+            result.error = (
+                report.decode("utf-8", "replace")
+                or f"Exited with code {proc.returncode}"
+            )
+    else:
+        result.result = report["result"]
+        result.error = report["error"]
+        result.elapsed = report["elapsed"]
+        result.peak_memory = report["peak_memory"]
+    return result
+
+
+async def _read_capped(
+    stream: asyncio.StreamReader, limit: int, tail: bool = False
+) -> Tuple[bytes, int]:
+    """First (last if ``tail``) ``limit`` bytes of ``stream`` and how many were dropped
+
+    Read to the end, so the process doesn't block on a full pipe.
+    """
+    data, dropped = bytearray(), 0
+    while chunk := await stream.read(1 << 16):
+        data += chunk
+        if (extra := len(data) - limit) > 0:
+            dropped += extra
+            if tail:
+                del data[:extra]
+            else:
+                del data[limit:]
+    return bytes(data), dropped
+
+
+def _kill(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
+
+def _main() -> None:
+    """Snippet runner, reads the code on stdin and reports on stderr"""
+    import contextlib
+    import traceback
+
+    code = sys.stdin.read()
+    result = error = None
+    start = time.perf_counter()
+    try:
+        from meval import meval
+
+        # Tracebacks and warnings of the snippet are part of its output
+        with contextlib.redirect_stderr(sys.stdout):
+            value = asyncio.run(
+                meval(code, {"__name__": "__snippet__", "__package__": None})
+            )
+        if value is not None:
+            result = repr(value)
+    except BaseException as e:  # skipcq: PYL-W0703
+        # Only the frames of the snippet, not the runner's
+        frames = traceback.extract_tb(e.__traceback__)
+        first = next(
+            (i for i, frame in enumerate(frames) if frame.filename == "<string>"), 0
+        )
+        error = (
+            "Traceback (most recent call last):\n"
+            + "".join(traceback.format_list(frames[first:]))
+            + "".join(traceback.format_exception_only(type(e), e))
+        )
+    elapsed = time.perf_counter() - start
+    try:
+        import resource
+
+        # KiB on Linux
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        peak_memory = 0
+    sys.stdout.flush()
+    sys.__stderr__.write(
+        "\n"
+        + json.dumps(
+            dict(result=result, error=error, elapsed=elapsed, peak_memory=peak_memory)
+        )
+        + "\n"
+    )
+
+
+if __name__ == "__main__":
+    _main()
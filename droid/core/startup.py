@@ -0,0 +1,100 @@
+__all__ = ["Phase", "StartupReport"]
+
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+from .metrics import METRICS
+
+STARTUP_SECONDS = METRICS.gauge(
+    "droid_startup_phase_seconds", "Duration of each startup phase", ("phase",)
+)
+TIME_TO_READY = METRICS.gauge(
+    "droid_startup_ready_seconds",
+    "Seconds from the start of init_bot to handling updates",
+)
+
+
+@dataclass
+class Phase:
+    name: str
+    # Seconds since the start of the report
+    start: float
+    end: Optional[float] = None
+    after: Tuple[str, ...] = ()
+
+    @property
+    def duration(self) -> float:
+        return (self.end or self.start) - self.start
+
+
+class StartupReport:
+    """Timings of the (possibly concurrent) startup phases
+
+    Every phase names the phases it waited for, the critical path is the chain
+    of phases that ended last, i.e. the ones worth making faster.
+    """
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.phases: Dict[str, Phase] = {}
+        self.ready: Optional[float] = None
+
+    def _now(self) -> float:
+        return time.perf_counter() - self.t0
+
+    async def run(self, name: str, aw: Awaitable[Any], after: Tuple[str, ...] = ()):
+        """Await ``aw`` as the phase ``name``
+
+        Parameters:
+        ----------
+            - name (`str`): Phase name.
+            - aw (`Awaitable[Any]`): Work of the phase.
+            - after (`Tuple[str, ...]`, optional): Phases it depends on. (Defaults to `()`)
+
+        Returns:
+        -------
+            `Any`: Result of ``aw``
+        """
+        phase = self.phases[name] = Phase(name, self._now(), after=after)
+        try:
+            return await aw
+        finally:
+            phase.end = self._now()
+            STARTUP_SECONDS.set(name, value=phase.duration)
+
+    def finish(self) -> None:
+        self.ready = self._now()
+        TIME_TO_READY.set(value=self.ready)
+
+    @property
+    def critical_path(self) -> List[str]:
+        done = [p for p in self.phases.values() if p.end is not None]
+        if not done:
+            return []
+        phase = max(done, key=lambda p: p.end)
+        path = [phase.name]
+        while deps := [self.phases[d] for d in phase.after if d in self.phases]:
+            phase = max(deps, key=lambda p: p.end or 0)
+            path.append(phase.name)
+        return path[::-1]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(
+            ready=self.ready,
+            critical_path=self.critical_path,
+            phases={
+                p.name: dict(start=p.start, end=p.end, duration=p.duration)
+                for p in self.phases.values()
+            },
+        )
+
+    def render(self) -> str:
+        lines = [
+            f"{p.name:<18} {p.start:7.3f}s -> {p.end or 0:7.3f}s  ({p.duration:.3f}s)"
+            for p in sorted(self.phases.values(), key=lambda p: p.start)
+        ]
+        lines.append(f"Critical path: {' -> '.join(self.critical_path)}")
+        if self.ready is not None:
+            lines.append(f"Ready in {self.ready:.3f}s")
+        return "\n".join(lines)
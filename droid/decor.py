@@ -1,10 +1,12 @@
-from typing import List, Pattern, Union
+from typing import List, Optional, Pattern, Union
 
 from pyrogram import filters
 from pyrogram.types import CallbackQuery, InlineQuery, Message
 
 from .config import CONFIG
 from .core.base_decorator import BaseDecorator
+from .core.command_context import FlagSchema
+from .core.command_router import CommandSpec
 
 
 class OnCmd(BaseDecorator):
@@ -16,17 +18,18 @@ class OnCmd(BaseDecorator):
         group: int = 0,
         owner_only: bool = False,
         admin_only: bool = False,
+        flags: Optional[FlagSchema] = None,
         *args,
         **kwargs
     ):
+        # Command matching is done once per message by the `CommandRouter`
         super().__init__(
-            filters=(
-                filters.command(cmd, prefixes, case_sensitive)
-                & self.base_filter(owner_only=owner_only)
-            ),
+            filters=self.base_filter(owner_only=owner_only),
+            command=CommandSpec.parse(cmd, prefixes, case_sensitive),
             group=group,
-            handle="message",
+            handle="command",
             admin_only=admin_only,
+            flags=flags,
             *args,
             **kwargs
         )
@@ -1,20 +1,34 @@
 import importlib
 import pkgutil
+import sys
 from pathlib import Path
+from types import ModuleType
+
+current_dir = Path(__file__).parent
+# Submodules are imported by the `Loader`, lazily where possible
+names = [info.name for info in pkgutil.iter_modules([str(current_dir)])]
+
+
+def path(name: str) -> Path:
+    return current_dir / f"{name}.py"
+
+
+def qualname(name: str) -> str:
+    return f"{__name__}.{name}"
+
+
+def load(name: str) -> ModuleType:
+    return importlib.import_module(qualname(name))
 
-current_dir = str(Path(__file__).parent)
-submodules = [
-    importlib.import_module("." + info.name, __name__)
-    for info in pkgutil.iter_modules([current_dir])
-]
 
 try:
     _reload_flag: bool
 
     # noinspection PyUnboundLocalVariable
     if _reload_flag:
-        # Module has been reloaded, reload our submodules
-        for module in submodules:
-            importlib.reload(module)
+        # Module has been reloaded, reload our imported submodules
+        for _name in names:
+            if (module := sys.modules.get(qualname(_name))) is not None:
+                importlib.reload(module)
 except NameError:
     _reload_flag = True
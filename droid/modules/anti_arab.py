@@ -31,7 +31,7 @@ class AntiArabic(mod.Module):
             "]+"
         )
 
-    @OnFlt(filters.chat(CHAT))
+    @OnFlt(filters.chat(CHAT), priority="moderation")
     async def detect(self, ctx: Ctx):
 
         # New Members
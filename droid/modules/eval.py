@@ -1,30 +1,178 @@
+import asyncio
 import inspect
 import os
 import re
 import sys
+import time
 import traceback
 from io import StringIO
-from typing import Any, Tuple
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Tuple
 
 import pyrogram
 from meval import meval
 
 from .. import mod, utils
+from ..config import CONFIG
+from ..core.command_context import FlagError, apply_schema
+from ..core.snippet import run_in_thread, run_isolated
 from ..decor import OnCmd
 
+# -timeout=N: deadline in seconds (0 = none)
+# -thread: run in a worker thread, -proc: run in a new Python process
+EVAL_FLAGS = {"timeout": float, "thread": bool, "proc": bool}
+_FLAG_RE = re.compile(r"-{1,2}(?P<flag>[A-Za-z_]+)(?:=(?P<value>\S+))?")
+# pyrogram.sync's wrapper of every client / bound method
+_SYNC_WRAPPER = pyrogram.Client.send_message.__code__
+
+
+def split_flags(text: str) -> Tuple[Dict[str, str], str]:
+    """Flags in front of the snippet, the snippet itself may contain e.g. `-x`"""
+    flags: Dict[str, str] = {}
+    while (parts := text.lstrip().split(None, 1)) and (
+        (match := _FLAG_RE.fullmatch(parts[0])) and match.group("flag") in EVAL_FLAGS
+    ):
+        flags[match.group("flag")] = match.group("value") or ""
+        text = parts[1] if len(parts) > 1 else ""
+    return flags, text
+
+
+async def _await_on(aw: Awaitable[Any], loop: asyncio.AbstractEventLoop) -> Any:
+    """Await ``aw`` on ``loop`` from a -thread snippet's own loop"""
+
+    async def run() -> Any:
+        return await aw
+
+    return _bridged(
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(run(), loop)), loop
+    )
+
+
+async def _iter_on(
+    it: AsyncIterator[Any], loop: asyncio.AbstractEventLoop
+) -> AsyncIterator[Any]:
+    while True:
+        try:
+            yield await _await_on(it.__anext__(), loop)
+        except StopAsyncIteration:
+            return
+
+
+def _unsynced(func: Any) -> Any:
+    """The coroutine function behind pyrogram's sync wrapper
+
+    Called off the main thread the wrapper blocks on the caller's own loop.
+    """
+    target = getattr(func, "__func__", func)
+    if getattr(target, "__code__", None) is not _SYNC_WRAPPER:
+        return func
+    if hasattr(func, "__self__"):
+        return target.__wrapped__.__get__(func.__self__)
+    return target.__wrapped__
+
+
+def _bridged(value: Any, loop: asyncio.AbstractEventLoop) -> Any:
+    if inspect.isawaitable(value):
+        return _await_on(value, loop)
+    if inspect.isasyncgen(value) or hasattr(value, "__anext__"):
+        return _iter_on(value, loop)
+    if isinstance(value, list):
+        return [_bridged(item, loop) for item in value]
+    if isinstance(value, dict):
+        return {key: _bridged(item, loop) for key, item in value.items()}
+    if callable(value) or type(value).__module__.split(".")[0] in (
+        "droid",
+        "pyrogram",
+    ):
+        return _Bridge(value, loop)
+    return value
+
+
+class _Bridge:
+    """What a -thread snippet sees of an object bound to the bot's loop
+
+    Awaitables it hands out are awaited on the bot's loop, the client, bot
+    and pyrogram objects it hands out are bridged in turn.
+    """
+
+    __slots__ = ("_obj", "_loop")
+
+    def __init__(self, obj: Any, loop: asyncio.AbstractEventLoop) -> None:
+        object.__setattr__(self, "_obj", obj)
+        object.__setattr__(self, "_loop", loop)
+
+    def __getattr__(self, name: str) -> Any:
+        return _bridged(getattr(self._obj, name), self._loop)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._obj, name, value)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return _bridged(_unsynced(self._obj)(*args, **kwargs), self._loop)
+
+    def __getitem__(self, key: Any) -> Any:
+        return _bridged(self._obj[key], self._loop)
+
+    def __iter__(self) -> Any:
+        return (_bridged(item, self._loop) for item in self._obj)
+
+    def __len__(self) -> int:
+        return len(self._obj)
+
+    def __bool__(self) -> bool:
+        return bool(self._obj)
+
+    def __eq__(self, other: Any) -> bool:
+        return self._obj == getattr(other, "_obj", other)
+
+    def __hash__(self) -> int:
+        return hash(self._obj)
+
+    def __repr__(self) -> str:
+        return repr(self._obj)
+
+    def __str__(self) -> str:
+        return str(self._obj)
+
 
 class Eval(mod.Module):
-    @OnCmd("evil", owner_only=True)
+    @OnCmd(
+        "evil",
+        owner_only=True,
+        priority="bulk",
+        shed_reply="⚠️ Too many snippets queued, try again later.",
+    )
     async def on_message(self, ctx):
-        code = ctx.msg.text[6:] if ctx.msg else None
+        flags, code = split_flags((ctx.input_raw or "") if ctx.msg else "")
         if not code:
             return await ctx.reply("Give me code to evaluate.")
+        try:
+            args = apply_schema(flags, EVAL_FLAGS)
+        except FlagError as e:
+            return await ctx.reply(f"⚠️ {e}")
+        timeout = args["timeout"]
+        if timeout is None:
+            # Snippets on the event loop can't be stopped when blocking anyway
+            timeout = CONFIG.eval_timeout if args["thread"] or args["proc"] else 0
+        if args["proc"]:
+            return await self._run_isolated(ctx, code, timeout)
 
         out_buf = StringIO()
+        bot_loop = asyncio.get_running_loop()
+
+        def on_bot(aw: Awaitable[Any]) -> Awaitable[Any]:
+            """Await something bound to the bot's loop, e.g. a client call, from a -thread snippet"""
+            if args["thread"]:
+                return _await_on(aw, bot_loop)
+            return aw
+
+        def share(value: Any) -> Any:
+            # -thread snippets run on a loop of their own, so every client
+            # call they make has to go through the bot's loop
+            return _bridged(value, bot_loop) if args["thread"] else value
 
         async def _eval() -> Tuple[str, str]:
             async def send(*args: Any, **kwargs: Any) -> pyrogram.types.Message:
-                return await ctx.msg.reply(*args, **kwargs)
+                return await on_bot(ctx.msg.reply(*args, **kwargs))
 
             def _print(*args: Any, **kwargs: Any) -> None:
                 if "file" not in kwargs:
@@ -34,19 +182,20 @@ class Eval(mod.Module):
 
             eval_vars = {
                 # Contextual info
-                "self": self,
-                "ctx": ctx,
-                "bot": self.bot,
+                "self": share(self),
+                "ctx": share(ctx),
+                "bot": share(self.bot),
                 "loop": self.bot.loop,
-                "client": self.bot.client,
-                "plugins": self.bot.plugins,
+                "client": share(self.bot.client),
+                "plugins": share(self.bot.plugins),
                 "stdout": out_buf,
                 # Convenience aliases
-                "msg": ctx.msg,
-                "message": ctx.msg,
+                "msg": share(ctx.msg),
+                "message": share(ctx.msg),
                 # Helper functions
                 "send": send,
                 "print": _print,
+                "on_bot": on_bot,
                 # Built-in modules
                 "inspect": inspect,
                 "os": os,
@@ -59,8 +208,22 @@ class Eval(mod.Module):
                 "utils": utils,
             }
 
+            start = time.perf_counter()
             try:
-                return "", await meval(code, globals(), **eval_vars)
+                if args["thread"]:
+                    # A loop of its own, so snippets can still use `await`
+                    return "", await run_in_thread(
+                        lambda: asyncio.run(meval(code, globals(), **eval_vars)),
+                        timeout,
+                    )
+                return "", await asyncio.wait_for(
+                    meval(code, globals(), **eval_vars), timeout or None
+                )
+            except asyncio.TimeoutError:
+                if not timeout or time.perf_counter() - start < timeout:
+                    # Raised by the snippet itself
+                    raise
+                return f"⏱ **Timed out after {timeout}s**\n\n", None
             except Exception as e:  # skipcq: PYL-W0703
                 # Find first traceback frame involving the snippet
                 first_snip_idx = -1
@@ -80,25 +243,67 @@ class Eval(mod.Module):
                 stripped_tb = tb[first_snip_idx:]
                 formatted_tb = utils.format_exception(e)
                 await ctx.reply(f"⚠️ Error executing snippet\n\n`{formatted_tb}`")
-                return
+                return None
 
-        prefix, result = await _eval()
+        start = time.perf_counter()
+        if (evaluated := await _eval()) is None:
+            return
+        prefix, result = evaluated
+        # No memory figure: in this process it would be the whole bot's
+        stats = self._stats(
+            "thread" if args["thread"] else "loop", time.perf_counter() - start
+        )
 
         # Always write result if no output has been collected thus far
-        if not out_buf.getvalue() or result is not None:
+        if not prefix and (not out_buf.getvalue() or result is not None):
             print(result, file=out_buf)
 
-        out = out_buf.getvalue()
+        await self._reply(ctx, prefix, code, out_buf.getvalue(), stats)
+
+    async def _run_isolated(self, ctx, code: str, timeout: float) -> None:
+        snippet = await run_isolated(code, timeout)
+        out = snippet.out
+        prefix = ""
+        if snippet.timed_out:
+            prefix = f"⏱ **Timed out after {timeout}s**\n\n"
+        elif snippet.error:
+            out += snippet.error
+        elif not out or snippet.result is not None:
+            out += f"{snippet.result}\n"
+        await self._reply(
+            ctx,
+            prefix,
+            code,
+            out,
+            self._stats(
+                "process",
+                snippet.elapsed,
+                # Unknown once killed
+                None if snippet.timed_out else snippet.peak_memory,
+            ),
+        )
+
+    @staticmethod
+    def _stats(mode: str, elapsed: float, peak_rss: Optional[int] = None) -> str:
+        text = f"__{mode}__ · `{elapsed * 1000:.1f} ms`"
+        if peak_rss is not None:
+            text += f" · peak RSS `{utils.human_bytes(peak_rss)}`"
+        return text
+
+    @staticmethod
+    async def _reply(ctx, prefix: str, code: str, out: str, stats: str) -> None:
         # Strip only ONE final newline to compensate for our message formatting
         if out.endswith("\n"):
             out = out[:-1]
-        if not out:
+        if not out and not prefix:
             return
         await ctx.reply(
             f"""{prefix}**>**
 ```{code}```
 
 **>>**
-```{out}```
+```{out or "(no output)"}```
+
+{stats}
 """
         )
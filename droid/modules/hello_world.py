@@ -6,23 +6,21 @@ from ..decor import OnCmd
 
 
 class Calculator(mod.Module):
-    @OnCmd("add")
+    @OnCmd("add", priority="session")
     async def on_message(self, ctx):
         async with Conversation(
-            client=self.bot.client, chat_id=ctx.msg.chat.id, loop=self.bot.loop
+            client=self.bot.client,
+            chat_id=ctx.msg.chat.id,
+            loop=self.bot.loop,
+            user_id=ctx.msg.from_user.id,
         ) as conv:
             await conv.send("**Send me a number to add. Press 'q' to EXIT**")
             sum = 0
-            while True:
-                if reply := await conv.listen(
-                    filters.create(
-                        lambda _, __, m: m.text and m.text.strip().isdigit()
-                    ),
-                    timeout=60,
-                ):
-                    num = int(reply.text)
-                    await conv.send(f"**>** `{sum}` + `{num}`\n\nAns. `{sum + num}`")
-                    sum += num
-                else:
-                    await conv.send("⏰ Times UP")
-                    break
+            async for reply in conv.stream(
+                filters.create(lambda _, __, m: m.text and m.text.strip().isdigit()),
+                idle_timeout=60,
+            ):
+                num = int(reply.text)
+                await conv.send(f"**>** `{sum}` + `{num}`\n\nAns. `{sum + num}`")
+                sum += num
+            await conv.send("⏰ Times UP")
@@ -0,0 +1,35 @@
+from .. import mod
+from ..core.command_context import Ctx
+from ..core.perf import PERF
+from ..decor import OnCmd
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+class Perf(mod.Module):
+    @OnCmd(
+        "perf", owner_only=True, flags={"n": (int, 10), "reset": bool, "startup": bool}
+    )
+    async def perf_cmd(self, ctx: Ctx):
+        if ctx.args["startup"]:
+            if self.bot.startup is None:
+                await ctx.reply("`No startup report`")
+            else:
+                await ctx.reply(f"**Startup**\n\n```{self.bot.startup.render()}```")
+            return
+        if ctx.args["reset"]:
+            PERF.reset()
+            await ctx.reply("✅  **Handler stats cleared**", del_in=5)
+            return
+        if not (rows := PERF.top(max(ctx.args["n"], 1))):
+            await ctx.reply("`No handler calls recorded yet`")
+            return
+        text = "**Slowest handlers** (ms)\n\n" + "\n\n".join(
+            f"• **{row['name']}** - `{row['count']}` calls, `{row['errors']}` errors\n"
+            f"   p50 `{_ms(row['p50'])}`  p95 `{_ms(row['p95'])}`  "
+            f"p99 `{_ms(row['p99'])}`  max `{_ms(row['max'])}`"
+            for row in rows
+        )
+        await ctx.reply(text)
@@ -1,4 +1,5 @@
 from .. import mod
+from ..core.base_decorator import refresh_admin_cache
 from ..core.command_context import Ctx
 from ..decor import OnCmd
 
@@ -9,7 +10,7 @@ class Ping(mod.Module):
 
         await ctx.reply(str(await self.bot.client.get_me()))
 
-    # @OnCmd("clear_cache", admin_only=True)
-    # async def cmd_clear_cache(self, ctx: Ctx):
-    #     refresh_admin_cache(ctx.msg.chat.id)
-    #     await ctx.msg.reply_text("Cached Cleared")
+    @OnCmd("clear_cache", admin_only=True)
+    async def cmd_clear_cache(self, ctx: Ctx):
+        refresh_admin_cache(ctx.msg.chat.id)
+        await ctx.msg.reply_text("Cached Cleared")
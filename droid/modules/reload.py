@@ -0,0 +1,27 @@
+from .. import mod, modules
+from ..core.command_context import Ctx
+from ..decor import OnCmd
+
+
+class Reload(mod.Module):
+    @OnCmd("reload", owner_only=True)
+    async def reload_cmd(self, ctx: Ctx):
+        if not (name := ctx.input.strip()):
+            await ctx.reply(
+                "**Modules:** " + ", ".join(f"`{x}`" for x in sorted(modules.names))
+            )
+            return
+        m = await ctx.reply(f"🔄  <i>Reloading '{name}'...</i>")
+        try:
+            report = await self.bot.reload_module(name)
+        except Exception as e:
+            await m.edit_text(f"⚠️  **Reload failed:** `{e.__class__.__name__}: {e}`")
+            return
+        await m.edit_text(
+            f"✅  **Reloaded** `{report['module']}` ({', '.join(report['classes'])})"
+            f" in `{report['total']:.3f}s`\n\n"
+            f"• import `{report['import_time']:.3f}s`\n"
+            f"• on_exit `{report['exit_time']:.3f}s`\n"
+            f"• on_load `{report['load_time']:.3f}s`\n"
+            f"• handlers `-{report['removed']} +{report['added']}`"
+        )
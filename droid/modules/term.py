@@ -1,6 +1,13 @@
 import asyncio
 import getpass
+import html
 import logging
+import signal
+import tempfile
+import time
+import weakref
+from contextlib import suppress
+from typing import Optional
 
 from pyrogram import filters
 from pyrogram.types import Message
@@ -10,67 +17,109 @@ from ..config import CONFIG
 from ..core.command_context import Ctx
 from ..core.conversation import Conversation
 from ..decor import OnCmd
-from ..utils import run_command
+from ..utils import ShellJob, ShellSession, human_bytes, run_in_pool
+
+# Min. seconds between live updates of a running command's message
+LIVE_EDIT_INTERVAL = 2
 
 
 class Term(mod.Module):
     async def on_load(self):
         self.lock = asyncio.Lock()
-        self.tasks = set()
+        # Task -> its job
+        self.tasks = {}
+        # Shells of the open terminals
+        self.shells = weakref.WeakSet()
 
-    @OnCmd("term", admin_only=True)
+    @OnCmd(
+        "term",
+        admin_only=True,
+        priority="session",
+        flags={"cpu": int, "mem": int, "out": int},
+    )
     async def term_cmd(self, ctx: Ctx):
-        async with Conversation(
-            client=self.bot.client, chat_id=ctx.msg.chat.id, loop=self.bot.loop
+        # Limits for this terminal, at most the configured ones (0 = none)
+        args = {
+            flag: self._clamp(ctx.args[flag], maximum)
+            for flag, maximum in (
+                ("cpu", CONFIG.term_cpu_limit),
+                ("mem", CONFIG.term_memory_limit),
+                ("out", CONFIG.term_output_limit),
+            )
+        }
+        shell = ShellSession(
+            cpu_limit=args["cpu"],
+            memory_limit=args["mem"] * 2**20,
+            output_limit=args["out"] * 2**20,
+        )
+        async with shell, Conversation(
+            client=self.bot.client,
+            # Keyed on the chat only, the input filter lets only the owners in
+            chat_id=ctx.msg.chat.id,
+            loop=self.bot.loop,
         ) as conv:
+            self.shells.add(shell)
             await conv.send("🖥  **Terminal is Now Active**")
-            while True:
-                if code := await conv.listen(
-                    # filters.create(
-                    #     lambda _, __, m: m.from_user.id == CONFIG.owner_id
-                    #     and m.text
-                    #     and not m.text.startswith(CONFIG.cmd_prefix)
-                    # ),
-                    filters.user(CONFIG.owner_id),
-                    timeout=180,
-                ):
-                    if code.text.lower().strip() in ("exit", "quit"):
-                        async with self.lock:
-                            m = await conv.send(
-                                "❌ <i>Stopping all pending tasks...</i>"
-                            )
-                            self.kill()
-                            await m.edit_text("✅  **Exited Terminal**")
-                        break
-                    else:
-                        async with self.lock:
-                            self.tasks.add(asyncio.create_task(self.terminal(code)))
-                else:
-                    await conv.send("Times Up !: Exiting Terminal...", del_in=5)
+            async for code in conv.stream(
+                # filters.create(
+                #     lambda _, __, m: m.from_user.id == CONFIG.owner_id
+                #     and m.text
+                #     and not m.text.startswith(CONFIG.cmd_prefix)
+                # ),
+                filters.user(CONFIG.owner_id),
+                idle_timeout=180,
+            ):
+                if code.text.lower().strip() in ("exit", "quit"):
+                    async with self.lock:
+                        m = await conv.send("❌ <i>Stopping all pending tasks...</i>")
+                        self.kill()
+                        await m.edit_text("✅  **Exited Terminal**")
                     break
+                else:
+                    async with self.lock:
+                        job = ShellJob(code.text)
+                        task = asyncio.create_task(self.terminal(code, shell, job))
+                        self.tasks[task] = job
+                        task.add_done_callback(self._forget)
+            else:
+                await conv.send("Times Up !: Exiting Terminal...", del_in=5)
 
     @OnCmd("tproc", admin_only=True)
     async def term_tasks(self, ctx: Ctx):
+        if not self.tasks:
+            await ctx.reply("`No Active Task found`")
+            return
+        tasks = list(self.tasks.items())
+        for _, job in tasks:
+            # Scanning /proc is blocking
+            await run_in_pool("io", job.sample)
         await ctx.reply(
-            "**TASK - IS RUNNING**\n\n"
-            + (
-                "\n".join(
-                    map(
-                        lambda x: f"• **{x.get_name()}** - `{x.cancelled()}`",
-                        self.tasks,
-                    )
-                )
-                if bool(self.tasks)
-                else "`No Active Task found`"
+            "**TERMINAL TASKS**\n\n"
+            + "\n\n".join(self._describe(task, job) for task, job in tasks)
+        )
+
+    @staticmethod
+    def _describe(task: asyncio.Task, job: ShellJob) -> str:
+        command = job.command if len(job.command) <= 50 else job.command[:49] + "…"
+        text = f"• **{task.get_name()}** - `{job.state}`\n   `{command}`"
+        if job.started is None:
+            return text
+        if job.ended is None:
+            text += (
+                f"\n   pgid `{job.pgid}`  pids `{' '.join(map(str, job.pids)) or '-'}`"
             )
+        return text + (
+            f"\n   wall `{job.wall:.1f}s`  cpu `{job.cpu:.2f}s`  "
+            f"rss `{human_bytes(job.rss)}`  peak `{human_bytes(job.peak_rss)}`  "
+            f"out `{human_bytes(job.output)}`"
         )
 
-    @OnCmd("tkill", admin_only=True)
+    @OnCmd("tkill", admin_only=True, flags={"all": bool})
     async def term_kill(self, ctx: Ctx):
         if not self.tasks:
             await ctx.reply("`No Active Task found`")
             return
-        if "all" in ctx.flags:
+        if ctx.args["all"]:
             m = await ctx.reply("❌ <i>Stopping all pending tasks...</i>")
             async with self.lock:
                 self.kill()
@@ -82,37 +131,110 @@ class Term(mod.Module):
                         if not t.done():
                             t.cancel()
                         async with self.lock:
-                            self.tasks.remove(t)
+                            self.tasks.pop(t, None)
                         await ctx.reply("✅  **Done**")
                         break
                 else:
                     await ctx.reply(f"⚠️  **Not Task found with name '{task_name}'**")
 
-    async def terminal(self, msg: Message):
-        if msg.text:
-            try:
-                out, err, _, proc = await run_command(msg.text, shell=True)
-                if out or err:
-                    text = f"<code>{getpass.getuser()} ~ {msg.text}</code>"
-                    if out:
-                        text += f"\n<pre>{out}</pre>"
-                    if err:
-                        text += f"\n\n<b>ERROR:</b> <pre>{err}</pre>"
-                    await Ctx(msg).reply(
-                        text,
-                        parse_mode="HTML",
+    async def terminal(self, msg: Message, shell: ShellSession, job: ShellJob):
+        if not msg.text:
+            return
+        header = (
+            f"<code>{getpass.getuser()} ~ {html.escape(msg.text, quote=False)}</code>"
+        )
+        # Room left for the output in one message
+        limit = CONFIG.max_text_length - len(header) - 64
+        reply = None
+        # Full output goes to disk, only the tail shown in the message is kept
+        log_file = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=CONFIG.down_path, prefix="term_", suffix=".txt"
+        )
+        tail, size, last_edit = "", 0, time.monotonic()
+        try:
+            # Nothing is awaited before the shell is queued for, so commands
+            # run in the order they were sent
+            async for text in shell.run(msg.text, job):
+                log_file.write(text)
+                size += len(text)
+                tail = (tail + text)[-limit:]
+                if time.monotonic() - last_edit >= LIVE_EDIT_INTERVAL:
+                    last_edit = time.monotonic()
+                    reply = await self._show(
+                        msg, reply, f"{header}\n<pre>{self._fit(tail, limit)}</pre>"
                     )
-            except asyncio.CancelledError:
-                if proc is not None:
-                    logging.info(f"Process ({proc.pid}) has been cancelled")
-                    proc.kill()
+            log_file.flush()
+            footer = self._footer(job)
+            if size > limit or len(output := html.escape(tail, quote=False)) > limit:
+                reply = await self._show(
+                    msg,
+                    reply,
+                    f"{header}\n<i>Output too long ({size} chars), sent as file</i>"
+                    + footer,
+                )
+                await reply.reply_document(log_file.name, quote=True)
+            else:
+                await self._show(
+                    msg,
+                    reply,
+                    f"{header}\n<pre>{output or '(no output)'}</pre>" + footer,
+                )
+        except asyncio.CancelledError:
+            logging.info(f"Command ({msg.text}) has been cancelled")
+            raise
+        finally:
+            log_file.close()
+
+    @staticmethod
+    def _clamp(value: Optional[int], maximum: int) -> int:
+        if value is None or value <= 0:
+            return maximum
+        return min(value, maximum) if maximum > 0 else value
+
+    @staticmethod
+    def _footer(job: ShellJob) -> str:
+        code = job.returncode
+        if code is not None and code > 128:
+            with suppress(ValueError):
+                code = f"{code} ({signal.Signals(code - 128).name})"
+        text = f"\n<b>Exit code:</b> <code>{code}</code>"
+        if job.limit:
+            text += f"  <i>(stopped by the {job.limit} limit)</i>"
+        if job.restarted:
+            text += "\n<i>Ran in a new shell, the state of the previous one is lost</i>"
+        return text + (
+            f"\n<b>Time:</b> <code>{job.wall:.2f}s</code>, "
+            f"<b>CPU:</b> <code>{job.cpu:.2f}s</code>, "
+            f"<b>Peak RSS:</b> <code>{human_bytes(job.peak_rss)}</code>"
+        )
+
+    @staticmethod
+    async def _show(msg: Message, reply: Optional[Message], text: str) -> Message:
+        """Reply to ``msg`` the first time, edit the reply afterwards"""
+        if reply is None:
+            return await msg.reply(text, parse_mode="HTML")
+        await reply.edit_text(text, parse_mode="HTML")
+        return reply
+
+    @staticmethod
+    def _fit(text: str, limit: int) -> str:
+        """Escaped tail of ``text`` which fits in ``limit`` chars"""
+        escaped = html.escape(text, quote=False)
+        while len(escaped) > limit:
+            text = text[len(text) // 10 or 1 :]
+            escaped = html.escape(text, quote=False)
+        return escaped
+
+    def _forget(self, task: asyncio.Task) -> None:
+        self.tasks.pop(task, None)
 
     def kill(self):
         for task in self.tasks:
             if not task.done():
                 task.cancel()
         self.tasks.clear()
+        for shell in self.shells:
+            shell.kill()
 
     async def on_exit(self):
-        if self.tasks:
-            self.kill()
+        self.kill()
@@ -119,7 +119,7 @@ class YoutubeDL(mod.Module):
                     reply_markup=data.buttons.add(c_q.from_user.id),
                 )
 
-    @OnCallback(triggers["download"])
+    @OnCallback(triggers["download"], priority="bulk")
     async def yt_download(self, c_q: CallbackQuery):
         match = c_q.matches[0]
         user_id = int(match.group("user_id"))
@@ -1,29 +1,237 @@
 import asyncio
+import codecs
+import importlib
 import logging
+import multiprocessing
+import os
+import shlex
+import shutil
+import signal
+import time
 import traceback
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from functools import partial, wraps
-from typing import Any, Awaitable, Callable, Optional, Tuple, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from pyrogram.types.messages_and_media.message import Message
 
+from .config import CONFIG
+
 logger = logging.getLogger(__name__)
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
 
 def format_exception(exc) -> str:
-    return "".join(
-        traceback.format_exception(etype=type(exc), value=exc, tb=exc.__traceback__)
-    )
+    # Positional, `etype` was removed in Python 3.10
+    return "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
 
 
-def run_sync(func: Callable[..., Any]) -> Awaitable[Any]:
-    """Runs the given sync function (optionally with arguments) on a separate thread."""
+class Pool:
+    """Named executor with queue depth and run time stats
+
+    Parameters:
+    ----------
+        - name (`str`): Pool name.
+        - kind (`str`, optional): `"thread"` or `"process"` (CPU-bound, picklable callables). (Defaults to `"thread"`)
+        - size (`Optional[int]`, optional): Max. workers. (Defaults to the executor default)
+    """
 
-    @wraps(func)
-    async def wrapper(*args: Any, **kwargs: Any):
+    def __init__(self, name: str, kind: str = "thread", size: Optional[int] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"[!] Invalid pool kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.size = size
+        self._executor: Optional[Executor] = None
+        self.submitted = 0
+        self.started = 0
+        self.finished = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.run_time = 0.0
+        self.max_run_time = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # Not forked from the running bot (its threads, locks and
+                # sockets), workers start clean and import what they run
+                self._executor = ProcessPoolExecutor(
+                    self.size,
+                    mp_context=multiprocessing.get_context(
+                        "forkserver"
+                        if "forkserver" in multiprocessing.get_all_start_methods()
+                        else "spawn"
+                    ),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.size, thread_name_prefix=f"droid-{self.name}"
+                )
+            self.size = self._executor._max_workers
+        return self._executor
+
+    def _timed(self, func: Callable[..., Any]) -> Any:
+        self.started += 1
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.finished += 1
+            self._observe(time.perf_counter() - start)
+
+    def _observe(self, elapsed: float) -> None:
+        self.run_time += elapsed
+        self.max_run_time = max(self.max_run_time, elapsed)
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run ``func(*args, **kwargs)`` in the pool, cancelling the await cancels it if not started yet"""
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+        self.submitted += 1
+        start = time.perf_counter()
+        if self.kind == "process":
+            # Only the (picklable) call crosses the process boundary
+            fut = loop.run_in_executor(
+                self.executor, partial(_invoke, func, args, kwargs)
+            )
+        else:
+            fut = loop.run_in_executor(
+                self.executor, self._timed, partial(func, *args, **kwargs)
+            )
+        try:
+            result = await fut
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            if self.kind == "process":
+                # Includes the time spent queued
+                self._observe(time.perf_counter() - start)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        done = self.completed + self.failed + self.cancelled
+        if self.kind == "process":
+            running = min(self.submitted - done, self.size or 0)
+            queued = self.submitted - done - running
+        else:
+            running = self.started - self.finished
+            queued = self.submitted - self.started - self.cancelled
+        return dict(
+            size=self.size or 0,
+            queued=max(queued, 0),
+            running=max(running, 0),
+            completed=self.completed,
+            failed=self.failed,
+            cancelled=self.cancelled,
+            run_time=round(self.run_time, 3),
+            max_run_time=round(self.max_run_time, 3),
+        )
+
+    def shutdown(self, wait: bool = False) -> None:
+        if self._executor is None:
+            return
+        try:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+        except TypeError:
+            # Python < 3.9
+            self._executor.shutdown(wait=wait)
+        self._executor = None
+
+
+def _invoke(func: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]):
+    if isinstance(func, tuple):
+        # (module, qualname) of a function decorated with `run_sync`
+        module, qualname = func
+        func = importlib.import_module(module)
+        for attr in qualname.split("."):
+            func = getattr(func, attr)
+        func = getattr(func, "__wrapped__", func)
+    return func(*args, **kwargs)
+
+
+POOLS: Dict[str, Pool] = {
+    # Blocking I/O, the default of `run_sync`
+    "io": Pool("io", "thread", CONFIG.io_pool_size or None),
+    # CPU-bound work, callables and arguments must be picklable
+    "cpu": Pool("cpu", "process", CONFIG.cpu_pool_size or None),
+}
+
+
+def get_pool(name: str) -> Pool:
+    if (pool := POOLS.get(name)) is None:
+        raise KeyError(f"No pool named '{name}', available: {', '.join(POOLS)}")
+    return pool
+
+
+def add_pool(name: str, kind: str = "thread", size: Optional[int] = None) -> Pool:
+    """Register a named pool, e.g. to keep a slow dependency off the shared `"io"` pool"""
+    if name in POOLS:
+        raise ValueError(f"Pool '{name}' already exists")
+    pool = POOLS[name] = Pool(name, kind, size)
+    return pool
+
+
+def shutdown_pools(wait: bool = False) -> None:
+    for pool in POOLS.values():
+        pool.shutdown(wait=wait)
+
 
-    return wrapper
+async def run_in_pool(
+    pool: str, func: Callable[..., Any], *args: Any, **kwargs: Any
+) -> Any:
+    return await get_pool(pool).run(func, *args, **kwargs)
+
+
+def run_sync(
+    func: Optional[Callable[..., Any]] = None, *, pool: str = "io"
+) -> Callable[..., Awaitable[Any]]:
+    """Runs the given sync function (optionally with arguments) on a separate thread.
+
+    ~ `@run_sync` or `@run_sync(pool="cpu")` for a named pool, process pools
+      need a module level function and picklable arguments.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any):
+            target = get_pool(pool)
+            if target.kind == "process":
+                return await target.run(
+                    (func.__module__, func.__qualname__), *args, **kwargs
+                )
+            return await target.run(func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator if func is None else decorator(func)
 
 
 def get_media(msg: Message):
@@ -89,3 +297,493 @@ async def run_command(
         out = std_out.decode("utf-8", "replace").strip()
         err = std_err.decode("utf-8", "replace").strip()
     return (out, err, return_code, proc)
+
+
+class StreamedCommand:
+    """Subprocess whose output is read while it runs
+
+    Output is read in ``read_size`` chunks into a queue of at most ``max_pending``
+    chunks, a slow consumer blocks the readers (and so the process, once its pipe
+    is full) instead of buffering without limit.
+
+    Usage:
+    -----
+        async with stream_command("ls", "-la") as cmd:
+            async for stream, text in cmd:
+                ...
+        cmd.returncode
+    """
+
+    def __init__(
+        self,
+        *args: str,
+        shell: bool = False,
+        merge_stderr: bool = False,
+        read_size: int = 4096,
+        max_pending: int = 32,
+    ) -> None:
+        self.args = args
+        self.shell = shell
+        self.merge_stderr = merge_stderr
+        self.read_size = read_size
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self._queue: "asyncio.Queue[Tuple[str, Optional[str]]]" = asyncio.Queue(
+            max_pending
+        )
+        self._readers: List[asyncio.Task] = []
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.proc.returncode if self.proc else None
+
+    async def start(self) -> "StreamedCommand":
+        kwargs = dict(
+            stdout=asyncio.subprocess.PIPE,
+            stderr=(
+                asyncio.subprocess.STDOUT
+                if self.merge_stderr
+                else asyncio.subprocess.PIPE
+            ),
+            # Own process group, so that the whole pipeline can be killed
+            start_new_session=os.name == "posix",
+        )
+        if self.shell:
+            self.proc = await asyncio.create_subprocess_shell(*self.args, **kwargs)
+        else:
+            self.proc = await asyncio.create_subprocess_exec(*self.args, **kwargs)
+        self._readers = [
+            asyncio.create_task(self._read(name, stream))
+            for name, stream in (
+                ("stdout", self.proc.stdout),
+                ("stderr", self.proc.stderr),
+            )
+            if stream is not None
+        ]
+        return self
+
+    async def _read(self, name: str, stream: asyncio.StreamReader) -> None:
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        try:
+            while chunk := await stream.read(self.read_size):
+                if text := decoder.decode(chunk):
+                    await self._queue.put((name, text))
+            if text := decoder.decode(b"", final=True):
+                await self._queue.put((name, text))
+        finally:
+            await self._queue.put((name, None))
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[str, str]]:
+        """(`"stdout"` or `"stderr"`, text) as it arrives"""
+        if self.proc is None:
+            await self.start()
+        open_streams = len(self._readers)
+        while open_streams:
+            name, text = await self._queue.get()
+            if text is None:
+                open_streams -= 1
+            else:
+                yield name, text
+        await self.proc.wait()
+
+    def kill(self) -> None:
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            else:
+                self.proc.kill()
+        except ProcessLookupError:
+            pass
+
+    async def close(self) -> None:
+        """Kill the process if it's still running and stop reading"""
+        self.kill()
+        for task in self._readers:
+            task.cancel()
+        await asyncio.gather(*self._readers, return_exceptions=True)
+        if self.proc is not None:
+            await self.proc.wait()
+
+    async def __aenter__(self) -> "StreamedCommand":
+        return await self.start()
+
+    async def __aexit__(self, *_: Any) -> None:
+        await self.close()
+
+
+def stream_command(*args: str, **kwargs: Any) -> StreamedCommand:
+    """Run Command, yielding its output incrementally
+
+    Parameters:
+    ----------
+        - shell (`bool`, optional): For single commands. (Defaults to `False`)
+        - merge_stderr (`bool`, optional): Send stderr to stdout, like a terminal. (Defaults to `False`)
+        - read_size (`int`, optional): Max. bytes per chunk. (Defaults to `4096`)
+        - max_pending (`int`, optional): Max. chunks buffered for the consumer. (Defaults to `32`)
+
+    Returns:
+    -------
+        `StreamedCommand`: Use with ``async with`` and ``async for``.
+    """
+    return StreamedCommand(*args, **kwargs)
+
+
+def human_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class ProcStat(NamedTuple):
+    ppid: int
+    pgid: int
+    # Seconds of user + system time
+    cpu: float
+    # Of its children that have been waited for
+    children_cpu: float
+    rss: int
+
+
+def proc_stat(pid: int) -> Optional[ProcStat]:
+    """Read ``/proc/<pid>/stat``, `None` if the process is gone (or there is no ``/proc``)"""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # Skip "pid (comm) ", comm may contain spaces
+    fields = data[data.rindex(b")") + 2 :].split()
+    return ProcStat(
+        ppid=int(fields[1]),
+        pgid=int(fields[2]),
+        cpu=(int(fields[11]) + int(fields[12])) / _CLK_TCK,
+        children_cpu=(int(fields[13]) + int(fields[14])) / _CLK_TCK,
+        rss=int(fields[21]) * _PAGE_SIZE,
+    )
+
+
+def peak_rss(pid: int) -> int:
+    """Highest RSS of a process so far (``VmHWM``) in bytes"""
+    try:
+        with open(f"/proc/{pid}/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def process_group(pgid: int) -> Dict[int, ProcStat]:
+    """Processes of the group ``pgid`` (pid -> `ProcStat`)"""
+    try:
+        pids = [int(x) for x in os.listdir("/proc") if x.isdigit()]
+    except OSError:
+        return {}
+    return {
+        pid: stat
+        for pid in pids
+        if (stat := proc_stat(pid)) is not None and stat.pgid == pgid
+    }
+
+
+# Last output of a job stopped by the output limit, which kills its shell
+LIMIT_NOTICE = "\n[output limit reached, shell restarted: cd / export state is lost]\n"
+
+
+def _marker_start(text: str, marker: str) -> int:
+    """Length of the longest end of ``text`` which ``marker`` starts with"""
+    for length in range(min(len(text), len(marker) - 1), 0, -1):
+        if marker.startswith(text[-length:]):
+            return length
+    return 0
+
+
+class ShellJob:
+    """One command of a `ShellSession` and the resources it used
+
+    CPU time counts the job's running processes and the ones the shell has
+    already reaped, peak RSS is the highest seen by `sample` (processes living
+    shorter than the sampling interval may be missed).
+    """
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.pgid: Optional[int] = None
+        self.started: Optional[float] = None
+        self.ended: Optional[float] = None
+        self.returncode: Optional[int] = None
+        # Limit which stopped the job
+        self.limit: Optional[str] = None
+        self.pids: List[int] = []
+        self.cpu = 0.0
+        self.rss = 0
+        self.peak_rss = 0
+        # Bytes
+        self.output = 0
+        # Ran in a new shell which replaced a killed / exited one (its state is lost)
+        self.restarted = False
+        self._cpu_base = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.started is None:
+            return "queued"
+        if self.ended is None:
+            return "running"
+        return f"killed ({self.limit})" if self.limit else "done"
+
+    @property
+    def wall(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.ended or time.monotonic()) - self.started
+
+    def begin(self, pgid: int) -> None:
+        self.pgid = pgid
+        self.started = time.monotonic()
+        if shell := proc_stat(pgid):
+            self._cpu_base = shell.cpu + shell.children_cpu
+
+    def sample(self) -> None:
+        if self.pgid is None or self.ended is not None:
+            return
+        group = process_group(self.pgid)
+        cpu = sum(
+            p.cpu + p.children_cpu for pid, p in group.items() if pid != self.pgid
+        )
+        if shell := group.pop(self.pgid, None):
+            # Builtins and loops run by the shell itself
+            cpu += shell.cpu + shell.children_cpu - self._cpu_base
+        self.cpu = max(self.cpu, cpu)
+        self.pids = sorted(group)
+        self.rss = sum(p.rss for p in group.values())
+        self.peak_rss = max(self.peak_rss, self.rss, *map(peak_rss, group))
+
+    def finish(self, returncode: Optional[int]) -> None:
+        self.ended = time.monotonic()
+        self.returncode = returncode
+        self.pids = []
+        self.rss = 0
+
+
+class ShellSession:
+    """Long-lived shell which runs commands one after another
+
+    Every command is written to the shell's stdin and followed by a unique
+    marker with its exit status, so state (``cd``, ``export``, ...) carries over
+    to the next command. Commands read ``/dev/null`` as stdin, they can't eat
+    the ones queued after them.
+
+    A command stopped early (cancelled or not read to the end) kills the shell,
+    the next one starts a fresh shell (``ShellJob.restarted``). So does a job
+    going over ``output_limit``, its output ends with what fit and
+    `LIMIT_NOTICE`. The exit status marker doesn't count as output.
+
+    Parameters:
+    ----------
+        - shell (`str`, optional): Shell to run. (Defaults to bash, else `/bin/sh`)
+        - read_size (`int`, optional): Max. bytes per chunk. (Defaults to `4096`)
+        - cpu_limit (`int`, optional): CPU seconds of every process (the shell's own
+          time adds up over the session), 0 for no limit. (Defaults to `0`)
+        - memory_limit (`int`, optional): Address space in bytes of every process, 0 for no limit. (Defaults to `0`)
+        - output_limit (`int`, optional): Output bytes of a job, 0 for no limit. (Defaults to `0`)
+        - sample_interval (`float`, optional): Seconds between usage samples of the running job. (Defaults to `1`)
+
+    Usage:
+    -----
+        async with ShellSession() as shell:
+            async for text in shell.run("cd /tmp && ls"):
+                ...
+            shell.last_returncode
+    """
+
+    def __init__(
+        self,
+        shell: Optional[str] = None,
+        read_size: int = 4096,
+        cpu_limit: int = 0,
+        memory_limit: int = 0,
+        output_limit: int = 0,
+        sample_interval: float = 1,
+    ) -> None:
+        self.shell = shell or shutil.which("bash") or "/bin/sh"
+        self.read_size = read_size
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self.output_limit = output_limit
+        self.sample_interval = sample_interval
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        # Running or last job
+        self.job: Optional[ShellJob] = None
+        self._killed = False
+        # Commands run in the order they were started
+        self._lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.proc is not None and self.proc.returncode is None and not self._killed
+        )
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.proc.pid if self.alive else None
+
+    async def start(self) -> "ShellSession":
+        if not self.alive:
+            await self._reap()
+            self._killed = False
+            self.proc = await asyncio.create_subprocess_exec(
+                self.shell,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=os.name == "posix",
+            )
+            # Nothing runs before the first command is written, and children inherit them
+            self._set_limits()
+        return self
+
+    def _set_limits(self) -> None:
+        limits = []
+        if self.cpu_limit > 0:
+            # SIGXCPU first, SIGKILL a second later
+            limits.append(("RLIMIT_CPU", (self.cpu_limit, self.cpu_limit + 1)))
+        if self.memory_limit > 0:
+            limits.append(("RLIMIT_AS", (self.memory_limit, self.memory_limit)))
+        for name, value in limits:
+            try:
+                resource.prlimit(self.proc.pid, getattr(resource, name), value)
+            except (AttributeError, OSError, ValueError) as e:
+                logger.warning(f"Unable to set {name} of the shell - {e}")
+
+    @property
+    def last_returncode(self) -> Optional[int]:
+        return self.job.returncode if self.job else None
+
+    async def _sample(self, job: ShellJob) -> None:
+        while True:
+            await run_in_pool("io", job.sample)
+            await asyncio.sleep(self.sample_interval)
+
+    async def run(
+        self, command: str, job: Optional[ShellJob] = None
+    ) -> AsyncIterator[str]:
+        """Output of ``command`` (stdout and stderr) as it arrives
+
+        Parameters:
+        ----------
+            - command (`str`): Shell command.
+            - job (`ShellJob`, optional): Filled in with the resource usage. (Defaults to a new one)
+        """
+        job = job or ShellJob(command)
+        async with self._lock:
+            job.restarted = self.proc is not None and not self.alive
+            await self.start()
+            self.job = job
+            job.begin(self.proc.pid)
+            marker = f"__droid_{uuid.uuid4().hex}__"
+            # eval: a syntax error fails this command only, instead of swallowing the marker
+            self.proc.stdin.write(
+                f"eval {shlex.quote(command)} < /dev/null\n"
+                f"printf '%s:%s\\n' {marker} \"$?\"\n".encode()
+            )
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+            pending, finished, returncode = "", False, None
+            sampler = asyncio.create_task(self._sample(job))
+            try:
+                await self.proc.stdin.drain()
+                while chunk := await self.proc.stdout.read(self.read_size):
+                    pending += decoder.decode(chunk)
+                    index = pending.find(marker)
+                    if index == -1:
+                        # Hold back only what could be the start of the marker
+                        cut = len(pending) - _marker_start(pending, marker)
+                        text, pending = pending[:cut], pending[cut:]
+                    else:
+                        text = pending[:index]
+                    # The marker isn't output, the limit applies to what's before it
+                    if text := self._count(job, text):
+                        yield text
+                    if job.limit:
+                        yield LIMIT_NOTICE
+                        return
+                    if index != -1:
+                        # ":<status>\n", may still be partly unread
+                        status = pending[index + len(marker) :]
+                        while "\n" not in status and (
+                            chunk := await self.proc.stdout.read(self.read_size)
+                        ):
+                            status += decoder.decode(chunk)
+                        status = status.split("\n", 1)[0][1:]
+                        if status.lstrip("-").isdigit():
+                            returncode = int(status)
+                        finished = True
+                        return
+                # The shell exited (e.g. `exit`)
+                if text := self._count(job, pending + decoder.decode(b"", final=True)):
+                    yield text
+                if job.limit:
+                    yield LIMIT_NOTICE
+                    return
+                returncode = await self.proc.wait()
+                finished = True
+            except (BrokenPipeError, ConnectionResetError):
+                returncode = await self.proc.wait()
+                finished = True
+            finally:
+                sampler.cancel()
+                try:
+                    if finished:
+                        # Scans /proc, not on the loop
+                        await run_in_pool("io", job.sample)
+                    else:
+                        self.kill()
+                finally:
+                    job.finish(returncode)
+
+    def _count(self, job: ShellJob, text: str) -> str:
+        """Add ``text`` to the job's output, cut at ``output_limit`` (which sets ``job.limit``)"""
+        data = text.encode()
+        job.output += len(data)
+        if not 0 < self.output_limit < job.output:
+            return text
+        job.limit = "output"
+        return data[: len(data) - (job.output - self.output_limit)].decode(
+            "utf-8", "ignore"
+        )
+
+    def kill(self) -> None:
+        if not self.alive:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            else:
+                self.proc.kill()
+        except ProcessLookupError:
+            pass
+        self._killed = True
+
+    async def _reap(self) -> None:
+        if self.proc is None:
+            return
+        # The process only counts as finished once its pipe hits EOF
+        while await self.proc.stdout.read(2**16):
+            pass
+        await self.proc.wait()
+
+    async def close(self) -> None:
+        """Kill the shell and everything it started"""
+        self.kill()
+        await self._reap()
+
+    async def __aenter__(self) -> "ShellSession":
+        return await self.start()
+
+    async def __aexit__(self, *_: Any) -> None:
+        await self.close()
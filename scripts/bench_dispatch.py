@@ -0,0 +1,63 @@
+"""Per-message command dispatch cost: `filters.command` per handler vs `CommandRouter`
+
+Usage: python -m scripts.bench_dispatch
+"""
+
+import asyncio
+import time
+
+from pyrogram import filters
+from pyrogram.handlers import MessageHandler
+from pyrogram.types import Message, User
+
+from droid.core.command_router import CommandRouter, CommandSpec
+from droid.decor import OnCmd
+
+ROUNDS = 500
+CMDS_PER_MODULE = 4
+
+
+async def callback(*_):
+    pass
+
+
+def build(n_modules: int):
+    legacy, router = [], CommandRouter("droid_bot")
+    for i in range(n_modules * CMDS_PER_MODULE):
+        base = OnCmd.base_filter(owner_only=False)
+        legacy.append(MessageHandler(callback, filters.command(f"cmd{i}", "/") & base))
+        router.add(callback, CommandSpec.parse(f"cmd{i}", "/"), base)
+    return legacy, router
+
+
+async def dispatch_legacy(handlers, msg) -> bool:
+    for handler in handlers:
+        if await handler.check(None, msg):
+            return True
+    return False
+
+
+async def bench(n_modules: int) -> None:
+    legacy, router = build(n_modules)
+    user = User(id=1, is_self=False)
+    # Worst case for the old path: the last registered command and plain text
+    texts = (f"/cmd{n_modules * CMDS_PER_MODULE - 1} some args", "just a message")
+    for name, func in (
+        ("filters.command", lambda m: dispatch_legacy(legacy, m)),
+        ("CommandRouter", lambda m: router.check(None, m)),
+    ):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            for text in texts:
+                await func(Message(message_id=1, text=text, from_user=user))
+        per_msg = (time.perf_counter() - start) / (ROUNDS * len(texts)) * 1e6
+        print(f"{n_modules:>4} modules | {name:<16} | {per_msg:8.2f} µs/msg")
+
+
+async def main() -> None:
+    for n_modules in (1, 10, 50, 200):
+        await bench(n_modules)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from droid.core import admin_cache
+from droid.core.admin_cache import AdminCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admin_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_ttl_and_lru(clock):
+    cache = AdminCache(ttl=10, max_size=2)
+    cache.set(1, {10})
+    cache.set(2, {20})
+    assert cache.peek(1) == {10}
+    clock[0] += 11
+    assert cache.peek(1) is None and 1 not in cache
+    cache.set(1, {10})
+    cache.set(3, {30})
+    # 2 was the least recently set
+    assert 2 not in cache and 1 in cache and 3 in cache
+    assert cache.evictions == 1
+
+
+def test_patch(clock):
+    cache = AdminCache()
+    cache.patch(1, 5, True)
+    assert 1 not in cache
+    cache.set(1, {10})
+    cache.patch(1, 5, True)
+    cache.patch(1, 10, False)
+    assert cache.peek(1) == {5}
+
+
+def test_single_flight():
+    async def main():
+        cache = AdminCache()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {1, 2}
+
+        results = await asyncio.gather(*(cache.get(7, fetch) for _ in range(5)))
+        assert results == [frozenset({1, 2})] * 5
+        assert calls == 1
+        assert await cache.get(7, fetch) == {1, 2}
+        assert calls == 1
+        assert (cache.hits, cache.misses) == (1, 5)
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_keeps_fetch():
+    async def main():
+        cache = AdminCache()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return {1}
+
+        first = asyncio.ensure_future(cache.get(7, fetch))
+        second = asyncio.ensure_future(cache.get(7, fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == {1}
+        assert calls == 1 and cache.peek(7) == {1}
+
+    asyncio.run(main())
+
+
+def test_update_during_fetch():
+    async def main():
+        cache = AdminCache()
+        answers = [{1}, {1, 2}]
+        fetching = asyncio.Event()
+
+        async def fetch():
+            admins = answers.pop(0)
+            fetching.set()
+            await asyncio.sleep(0.01)
+            return admins
+
+        task = asyncio.ensure_future(cache.get(7, fetch))
+        await fetching.wait()
+        # 2 was promoted while the first fetch was in flight
+        cache.patch(7, 2, True)
+        assert await task == {1, 2}
+        assert cache.peek(7) == {1, 2} and not answers
+
+    asyncio.run(main())
+
+
+def test_update_during_every_fetch_is_not_cached():
+    async def main():
+        cache = AdminCache()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            cache.patch(7, calls, True)
+            return {calls}
+
+        assert await cache.get(7, fetch) == {admin_cache._FETCH_TRIES}
+        assert calls == admin_cache._FETCH_TRIES
+        assert 7 not in cache
+
+    asyncio.run(main())
+
+
+def test_stale_drops_idle_chats(clock):
+    cache = AdminCache(ttl=10, idle_ttl=100)
+    cache.touch(1)
+    cache.touch(2)
+    cache._pinned.add(2)
+    cache.set(3, {30})
+    cache.touch(3)
+    assert sorted(cache.stale()) == [1, 2]
+    # Expiring within the margin
+    assert sorted(cache.stale(margin=20)) == [1, 2, 3]
+    clock[0] += 101
+    assert sorted(cache.stale()) == [2]
+    assert sorted(cache._seen) == [2]
@@ -0,0 +1,106 @@
+import random
+
+from pyrogram.parser.utils import add_surrogates
+from pyrogram.types import MessageEntity
+
+from droid.core.command_context import FLAGS_RE, parse_flags, split_entities
+
+# Pieces flags, values and the text around them are made of
+PIECES = [
+    " -",
+    " --",
+    "-",
+    "=",
+    "a",
+    "Zz_",
+    "7",
+    " ",
+    "\n",
+    '"',
+    "'",
+    "x y",
+    "'x y'",
+    '"a-b"',
+    "é",
+    ".",
+]
+
+
+def old_parse(text):
+    return FLAGS_RE.findall(text), FLAGS_RE.sub("", text)
+
+
+def test_parse_flags_matches_flags_re():
+    rnd = random.Random(0)
+    for _ in range(20000):
+        text = "".join(rnd.choice(PIECES) for _ in range(rnd.randint(0, 16)))
+        assert parse_flags(text) == old_parse(text), repr(text)
+
+
+def test_parse_flags():
+    text = "/cmd -a --bb=3 -c='x y' -d=\"it's\" rest -e"
+    assert parse_flags(text) == (
+        [("a", ""), ("bb", "3"), ("c", "'x y'"), ("d", '"it\'s"'), ("e", "")],
+        "/cmd rest",
+    )
+    assert parse_flags(text) == old_parse(text)
+    # Not a flag: no whitespace before it, or something other than a value after it
+    for text in ("a-b", "-a.b", "-a='x", "-1", "--"):
+        assert parse_flags(text) == ([], text) == old_parse(text)
+
+
+def entity(offset, length):
+    return MessageEntity(type="bold", offset=offset, length=length)
+
+
+def check_parts(parts, limit):
+    for text, entities in parts:
+        assert 0 < len(text) <= limit
+        assert text == text.strip()
+        for e in entities:
+            assert e.length > 0 and 0 <= e.offset and e.offset + e.length <= len(text)
+
+
+def test_split_entities_short_text():
+    e = entity(0, 5)
+    assert [
+        (t, [(x.offset, x.length) for x in es])
+        for t, es in split_entities("hello", [e], 10)
+    ] == [("hello", [(0, 5)])]
+
+
+def test_split_entities_cuts_at_line_breaks():
+    text = "line one\n" * 50
+    parts = split_entities(text, [], 100)
+    check_parts(parts, 100)
+    assert all(t.endswith("line one") for t, _ in parts)
+    assert "\n".join(t for t, _ in parts) == text.strip()
+
+
+def test_split_entities_avoids_entities():
+    # A line break inside the bold part, and one outside it further back
+    text = "a" * 40 + "\n" + "b" * 30 + "\n" + "c" * 20 + "\n" + "d" * 30
+    bold = entity(72, 30)
+    parts = split_entities(text, [bold], 110)
+    check_parts(parts, 110)
+    assert parts[0][0] == "a" * 40 + "\n" + "b" * 30
+    assert [(e.offset, e.length) for e in parts[1][1]] == [(0, 30)]
+
+
+def test_split_entities_splits_crossing_entity():
+    text = "x" * 250
+    parts = split_entities(text, [entity(0, 250)], 100)
+    check_parts(parts, 100)
+    assert [len(t) for t, _ in parts] == [100, 100, 50]
+    for t, entities in parts:
+        assert [(e.offset, e.length) for e in entities] == [(0, len(t))]
+
+
+def test_split_entities_keeps_surrogate_pairs():
+    text = add_surrogates("😀" * 120)
+    parts = split_entities(text, [], 99)
+    check_parts(parts, 99)
+    for t, _ in parts:
+        assert not "\ud800" <= t[-1] <= "\udbff"
+        assert not "\udc00" <= t[0] <= "\udfff"
+    assert "".join(t for t, _ in parts) == text
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+from pyrogram.errors import MessageNotModified
+
+from droid.core.edit_queue import EditCoalescer
+
+
+class Message:
+    """Records the edits applied to it"""
+
+    def __init__(self, latency: float = 0) -> None:
+        self.latency = latency
+        self.edits = []
+
+    def edit(self, text):
+        async def call():
+            self.edits.append((text, time.monotonic()))
+            await asyncio.sleep(self.latency)
+            return text
+
+        return call
+
+
+def test_coalesces_pending_edits():
+    async def main():
+        queue = EditCoalescer(interval=0.05)
+        msg = Message()
+        futs = [queue.submit(1, msg.edit(text), text) for text in "abc"]
+        assert await asyncio.gather(*futs) == ["c"] * 3
+        assert [text for text, _ in msg.edits] == ["c"]
+        assert queue.stats["coalesced"] == 2 and queue.pending == 0
+
+    asyncio.run(main())
+
+
+def test_paces_edits_of_a_message():
+    async def main():
+        queue = EditCoalescer(interval=0.05)
+        msg, other = Message(), Message()
+        await queue.submit(1, msg.edit("a"), "a")
+        await asyncio.gather(
+            queue.submit(1, msg.edit("b"), "b"), queue.submit(2, other.edit("x"), "x")
+        )
+        assert msg.edits[1][1] - msg.edits[0][1] >= 0.045
+        # Other messages aren't held up
+        assert other.edits[0][1] - msg.edits[0][1] < 0.04
+
+    asyncio.run(main())
+
+
+def test_reverting_to_an_older_text_is_applied():
+    async def main():
+        queue = EditCoalescer(interval=0.01)
+        msg = Message()
+        for text in "aba":
+            assert await queue.submit(1, msg.edit(text), text) == text
+        assert [text for text, _ in msg.edits] == ["a", "b", "a"]
+
+        # Same within a burst, each edit queued while the one before is applied
+        msg = Message(latency=0.02)
+        futs = []
+        for i, text in enumerate("aba"):
+            futs.append(queue.submit(2, msg.edit(text), text))
+            while len(msg.edits) <= i:
+                await asyncio.sleep(0.001)
+        assert await asyncio.gather(*futs) == ["a", "b", "a"]
+        assert [text for text, _ in msg.edits] == ["a", "b", "a"]
+
+    asyncio.run(main())
+
+
+def test_same_edit_in_a_burst_is_skipped():
+    async def main():
+        queue = EditCoalescer(interval=0.05)
+        msg = Message(latency=0.02)
+        first = queue.submit(1, msg.edit("a"), "a")
+        await asyncio.sleep(0.01)
+        # Queued while the first one is being applied
+        again = queue.submit(1, msg.edit("a"), "a")
+        assert await first == "a"
+        with pytest.raises(MessageNotModified):
+            await again
+        assert [text for text, _ in msg.edits] == ["a"]
+        assert queue.stats["unchanged"] == 1
+
+    asyncio.run(main())
+
+
+def test_errors_reach_every_waiter():
+    async def main():
+        queue = EditCoalescer(interval=0.01)
+
+        async def fail():
+            raise ValueError("boom")
+
+        futs = [queue.submit(1, fail, "a"), queue.submit(1, fail, "a")]
+        for fut in futs:
+            with pytest.raises(ValueError):
+                await fut
+        assert queue.pending == 0
+
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pyrogram.raw import functions, types
+
+from droid.core import rate_limiter
+from droid.core.rate_limiter import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def send(peer):
+    return functions.messages.SendMessage(peer=peer, message="hi", random_id=1)
+
+
+def test_burst_then_rate():
+    async def main():
+        bucket = TokenBucket(rate=50, capacity=2)
+        waits = [await bucket.acquire() for _ in range(4)]
+        assert waits[0] < 0.005 and waits[1] < 0.005
+        # One token every 20 ms once the burst is used up
+        assert 0.01 < waits[2] < 0.1 and 0.01 < waits[3] < 0.1
+
+    asyncio.run(main())
+
+
+def test_penalize_blocks_and_slows_down():
+    async def main():
+        bucket = TokenBucket(rate=100, capacity=5)
+        bucket.penalize(0.05)
+        assert bucket.rate == 50
+        assert await bucket.acquire() >= 0.045
+
+    asyncio.run(main())
+
+
+def test_idle(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    assert bucket.idle
+    bucket.tokens = 0
+    assert not bucket.idle
+    clock[0] += 2
+    assert bucket.idle
+
+    bucket.penalize(30)
+    # Refilled, but still blocked
+    clock[0] += 10
+    assert not bucket.idle and bucket.tokens == bucket.capacity
+    # No longer blocked, still at the reduced rate
+    clock[0] += 25
+    assert not bucket.idle
+    clock[0] += 30
+    assert bucket.idle and bucket.rate == bucket.base_rate
+
+
+def test_eviction_keeps_busy_buckets(clock):
+    limiter = RateLimiter(30, 1, 1, max_chats=3)
+    limiter.flood(("user", 1), 30)
+    limiter.bucket(("user", 2)).tokens = 0
+    limiter.bucket(("user", 3))
+    limiter.bucket(("user", 4))
+    assert sorted(limiter.buckets) == [("user", 1), ("user", 2), ("user", 4)]
+
+
+def test_peer_key():
+    assert RateLimiter.peer_key(
+        send(types.InputPeerUser(user_id=1, access_hash=0))
+    ) == ("user", 1)
+    assert RateLimiter.peer_key(
+        send(types.InputPeerChannel(channel_id=2, access_hash=0))
+    ) == ("channel", 2)
+    assert RateLimiter.peer_key(send(types.InputPeerSelf())) == ("user", 0)
+    read = functions.users.GetFullUser(id=types.InputUserSelf())
+    assert RateLimiter.peer_key(read) is None
+
+
+def test_acquire_counts():
+    async def main():
+        limiter = RateLimiter(1000, 1000, 1000)
+        assert await limiter.acquire(send(types.InputPeerChat(chat_id=3))) == (
+            "chat",
+            3,
+        )
+        assert await limiter.acquire(functions.help.GetConfig()) is None
+        assert limiter.stats["sent"] == 1 and limiter.stats["chats"] == 1
+
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+import asyncio
+
+from droid.core.scheduler import Scheduler
+
+
+def recorder(ran, name, gate=None):
+    async def job():
+        if gate is not None:
+            await gate.wait()
+        ran.append(name)
+
+    return job
+
+
+def test_lane_order_and_moderation_first():
+    async def main():
+        scheduler = Scheduler()
+        ran, gate = [], asyncio.Event()
+        await scheduler.submit(1, "interactive", recorder(ran, "a", gate))
+        # Running, the rest queues up behind it
+        await asyncio.sleep(0)
+        await scheduler.submit(1, "interactive", recorder(ran, "b"))
+        await scheduler.submit(1, "interactive", recorder(ran, "c"))
+        await scheduler.submit(1, "moderation", recorder(ran, "ban"))
+        # Another chat isn't held up by the first one
+        await scheduler.submit(2, "interactive", recorder(ran, "other"))
+        await asyncio.sleep(0.01)
+        assert ran == ["other"]
+        gate.set()
+        await asyncio.sleep(0.01)
+        assert ran == ["other", "a", "ban", "b", "c"]
+        assert not scheduler.lanes and scheduler.pending == 0
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_bulk_and_session_leave_the_lane_free():
+    async def main():
+        scheduler = Scheduler(bulk_workers=1)
+        ran, gate = [], asyncio.Event()
+        await scheduler.submit(1, "bulk", recorder(ran, "bulk", gate))
+        await scheduler.submit(1, "session", recorder(ran, "session", gate))
+        await scheduler.submit(1, "interactive", recorder(ran, "reply"))
+        await asyncio.sleep(0.01)
+        assert ran == ["reply"]
+        gate.set()
+        await asyncio.sleep(0.01)
+        assert sorted(ran) == ["bulk", "reply", "session"]
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_shedding():
+    async def main():
+        scheduler = Scheduler(bulk_workers=1, bulk_queue=1, lane_limit=2)
+        ran = []
+        submit = scheduler.submit
+        # Nothing runs before the first await that yields
+        assert await submit(1, "bulk", recorder(ran, "b1"))
+        assert not await submit(1, "bulk", recorder(ran, "b2"))
+
+        assert await submit(1, "interactive", recorder(ran, "i1"))
+        assert await submit(1, "interactive", recorder(ran, "i2"))
+        assert not await submit(1, "interactive", recorder(ran, "i3"))
+
+        # Moderation jobs have a limit of their own
+        assert await submit(1, "moderation", recorder(ran, "m1"))
+        assert await submit(1, "moderation", recorder(ran, "m2"))
+        assert not await submit(1, "moderation", recorder(ran, "m3"))
+
+        callback = ("callback", 5, 10, b"data")
+        assert await submit(2, "interactive", recorder(ran, "c1"), dedup=callback)
+        assert not await submit(2, "interactive", recorder(ran, "c2"), dedup=callback)
+        # Only the newest inline query of a user runs
+        assert await submit(3, "interactive", recorder(ran, "q1"), dedup=("inline", 5))
+        assert await submit(3, "interactive", recorder(ran, "q2"), dedup=("inline", 5))
+
+        await asyncio.sleep(0.01)
+        assert sorted(ran) == ["b1", "c1", "i1", "i2", "m1", "m2", "q2"]
+        assert scheduler.shed == dict(
+            bulk_full=1, lane_full=1, moderation_full=1, duplicate=1, superseded=1
+        )
+        assert scheduler.pending == 0
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_overload_and_stale():
+    async def main():
+        scheduler = Scheduler(max_pending=2, max_age=0.01)
+        ran, gate = [], asyncio.Event()
+        assert await scheduler.submit(1, "interactive", recorder(ran, "a", gate))
+        assert await scheduler.submit(1, "interactive", recorder(ran, "b"))
+        assert not await scheduler.submit(2, "interactive", recorder(ran, "c"))
+        await asyncio.sleep(0.02)
+        gate.set()
+        await asyncio.sleep(0.01)
+        # Waited too long behind "a"
+        assert ran == ["a"]
+        assert scheduler.shed == dict(overload=1, stale=1)
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_failing_job_keeps_the_lane_going():
+    async def main():
+        scheduler = Scheduler()
+        ran = []
+
+        async def fail():
+            raise ValueError("boom")
+
+        await scheduler.submit(1, "interactive", fail)
+        await scheduler.submit(1, "interactive", recorder(ran, "next"))
+        await asyncio.sleep(0.01)
+        assert ran == ["next"]
+        await scheduler.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+import asyncio
+
+from droid.utils import LIMIT_NOTICE, ShellJob, ShellSession
+
+
+async def run(shell, command):
+    job = ShellJob(command)
+    out = "".join([text async for text in shell.run(command, job)])
+    return out, job
+
+
+def test_state_carries_over():
+    async def main():
+        async with ShellSession() as shell:
+            await run(shell, "cd /tmp && export DROID_TEST=1")
+            out, job = await run(shell, 'pwd; echo "$DROID_TEST"')
+            assert out == "/tmp\n1\n"
+            assert job.returncode == 0 and not job.restarted
+
+    asyncio.run(main())
+
+
+def test_marker_framing():
+    async def main():
+        async with ShellSession(read_size=7) as shell:
+            # No trailing newline, the marker still ends the command
+            assert await run(shell, "printf abc") == ("abc", shell.job)
+            out, job = await run(
+                shell, "echo out; echo err >&2; exit_code() { return 3; }; exit_code"
+            )
+            assert out == "out\nerr\n" and job.returncode == 3
+            # A syntax error only fails its own command
+            out, job = await run(shell, "if then")
+            assert job.returncode != 0 and "syntax" in out
+            out, job = await run(shell, "echo still here")
+            assert out == "still here\n" and job.returncode == 0
+            # Commands can't read the ones queued after them
+            out, _ = await run(shell, "cat")
+            assert out == ""
+
+    asyncio.run(main())
+
+
+def test_marker_split_across_reads():
+    async def main():
+        for read_size in (1, 2, 3, 5, 8):
+            async with ShellSession(read_size=read_size) as shell:
+                for i in range(12):
+                    out, job = await run(shell, f"printf %s '{'x' * i}'; (exit {i})")
+                    assert (out, job.returncode) == ("x" * i, i)
+
+    asyncio.run(main())
+
+
+def test_exit_restarts_the_shell():
+    async def main():
+        async with ShellSession() as shell:
+            await run(shell, "cd /tmp")
+            out, job = await run(shell, "exit 4")
+            assert job.returncode == 4
+            out, job = await run(shell, "pwd")
+            assert job.restarted and out != "/tmp\n"
+
+    asyncio.run(main())
+
+
+def test_output_limit():
+    async def main():
+        async with ShellSession(output_limit=100, read_size=32) as shell:
+            await run(shell, "cd /tmp")
+            # Exactly the limit, the marker after it doesn't count
+            out, job = await run(shell, "head -c 100 /dev/zero | tr '\\0' a")
+            assert out == "a" * 100 and job.limit is None and job.returncode == 0
+
+            out, job = await run(shell, "yes ab | head -c 1000")
+            assert out == "ab\n" * 33 + "a" + LIMIT_NOTICE
+            assert job.limit == "output" and job.output > 100
+            assert job.state == "killed (output)"
+
+            out, job = await run(shell, "pwd")
+            assert job.restarted and out != "/tmp\n"
+
+    asyncio.run(main())
+
+
+def test_cancelled_command_kills_the_shell():
+    async def main():
+        async with ShellSession() as shell:
+            gen = shell.run("echo first; sleep 30")
+            # Streamed while the command is still running
+            assert await asyncio.wait_for(gen.__anext__(), 5) == "first\n"
+            await gen.aclose()
+            assert not shell.alive
+            out, job = await run(shell, "echo again")
+            assert out == "again\n" and job.restarted
+
+    asyncio.run(main())